@@ -1,25 +1,144 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+import jwt
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from os import getenv
+from metrics import BCRYPT_LATENCY
+from keys import key_store
 
 load_dotenv()
 
-SECRET_KEY = getenv('SECRET_KEY')
-ALGORITHM = getenv('ALGORITHM')
+# Factor de coste de bcrypt: cada unidad extra duplica el tiempo de hashing
+BCRYPT_ROUNDS = int(getenv('BCRYPT_ROUNDS', '12'))
+HASH_WORKERS = int(getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(getenv('HASH_QUEUE_SIZE', '32'))
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Vida de los tokens en segundos: el access token es corto y se renueva con
+# el refresh token en /auth/refresh, sin volver a pasar por bcrypt
+ACCESS_TOKEN_TTL = int(getenv('ACCESS_TOKEN_TTL', '900'))
+REFRESH_TOKEN_TTL = int(getenv('REFRESH_TOKEN_TTL', str(30 * 24 * 3600)))
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                              bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashingOverloaded(Exception):
+    """
+    La cola de hashing está llena; el request debe reintentarse más tarde
+    """
+
+
+class HashingPool:
+    """
+    Ejecuta bcrypt en un pool de hilos de tamaño fijo. Como mucho admite
+    `workers + max_queue` operaciones pendientes; a partir de ahí rechaza
+    en lugar de acumular latencia
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def _done(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingOverloaded("Cola de hashing llena")
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "queued": max(self._pending - self.workers, 0),
+                "rejected": self._rejected,
+                "rounds": BCRYPT_ROUNDS,
+            }
+
+
+hashing_pool = HashingPool(HASH_WORKERS, HASH_QUEUE_SIZE)
+
+
+def _timed(operation, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        BCRYPT_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(_timed, "hash", bcrypt_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(_timed, "verify", bcrypt_context.verify,
+                                  password, hashed_password)
+
+
+def _sign(claims: dict) -> str:
+    kid, private_key, algorithm = key_store.signing_key()
+    return jwt.encode(claims, private_key, algorithm=algorithm, headers={'kid': kid})
 
 
 def create_access_token(username: str):
     """
-    Crea un token JWT con el email y el nombre de usuario del usuario
+    Crea un access token JWT de vida corta con el nombre de usuario
+    """
+    expires = datetime.now(timezone.utc) + timedelta(seconds=ACCESS_TOKEN_TTL)
+    encode = {'username': username, 'type': 'access', 'exp': expires}
+    return _sign(encode)
+
+
+def create_refresh_token(username: str, family: str = None):
+    """
+    Crea un refresh token. `jti` identifica este token concreto y `fam` la
+    cadena de rotaciones que empezó en el login
     """
-    encode = {'username': username}
-    expires = datetime.now() + timedelta(days=30)
-    encode.update({'exp': expires})
-    return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
+    expires = datetime.now(timezone.utc) + timedelta(seconds=REFRESH_TOKEN_TTL)
+    encode = {
+        'username': username,
+        'type': 'refresh',
+        'jti': uuid.uuid4().hex,
+        'fam': family or uuid.uuid4().hex,
+        'exp': expires,
+    }
+    return _sign(encode)
+
+
+def issue_tokens(username: str, family: str = None):
+    return {
+        'token': create_access_token(username),
+        'refresh_token': create_refresh_token(username, family),
+        'token_type': 'bearer',
+        'expires_in': ACCESS_TOKEN_TTL,
+    }
 
 
 def verify_token(token: str):
@@ -27,7 +146,124 @@ def verify_token(token: str):
     Verifica el token JWT y devuelve el payload si es válido
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
\ No newline at end of file
+        kid = jwt.get_unverified_header(token).get('kid')
+        key = key_store.verification_key(kid)
+        if key is None:
+            return None
+        public_key, algorithm = key
+        return jwt.decode(token, public_key, algorithms=[algorithm])
+    except jwt.InvalidTokenError:
+        return None
+
+
+class RevocationList:
+    """
+    Conjunto en memoria de ids revocados (jti de refresh tokens ya rotados y
+    familias cerradas), guardados como los 16 bytes del UUID junto a su
+    expiración. La tabla revoked_tokens es la fuente de verdad: el conjunto
+    solo evita ir a la base de datos para rechazar un token ya conocido, lo
+    que falta se consulta en la tabla, y la rotación se decide con un
+    INSERT ... ON CONFLICT, que es atómico entre réplicas
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._next_prune = 0.0
+
+    def __contains__(self, token_id: str) -> bool:
+        with self._lock:
+            return uuid.UUID(token_id).bytes in self._revoked
+
+    async def revoked(self, database, *token_ids: str) -> set:
+        """
+        Devuelve cuáles de `token_ids` están revocados. Lo que no está en
+        memoria se consulta en una sola query: otro worker u otra réplica
+        puede haberlo revocado. Solo se guardan en memoria los positivos
+        """
+        found = {token_id for token_id in token_ids if token_id in self}
+        missing = [token_id for token_id in token_ids if token_id not in found]
+        if missing:
+            rows = await database.fetch_all("""
+                SELECT jti::text AS jti, extract(epoch FROM expires_at) AS exp
+                FROM revoked_tokens WHERE jti = ANY(%s::uuid[])
+            """, (missing,))
+            requested = {uuid.UUID(token_id): token_id for token_id in missing}
+            for row in rows:
+                token_id = requested[uuid.UUID(row["jti"])]
+                self._add(token_id, float(row["exp"]))
+                found.add(token_id)
+        return found
+
+    def _add(self, token_id: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._revoked[uuid.UUID(token_id).bytes] = expires_at
+            # Un id expirado ya no hace falta: el propio JWT está caducado
+            if now >= self._next_prune:
+                self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+                self._next_prune = now + 60
+
+    async def load(self, database):
+        await database.execute("DELETE FROM revoked_tokens WHERE expires_at < now()")
+        rows = await database.fetch_all(
+            "SELECT jti::text AS jti, extract(epoch FROM expires_at) AS exp FROM revoked_tokens")
+        for row in rows:
+            self._add(row["jti"], float(row["exp"]))
+
+    async def revoke(self, database, token_id: str, expires_at: float) -> bool:
+        """
+        Revoca un id y devuelve False si ya estaba revocado
+        """
+        row = await database.fetch_one("""
+            INSERT INTO revoked_tokens (jti, expires_at) VALUES (%s, to_timestamp(%s))
+            ON CONFLICT (jti) DO NOTHING RETURNING jti
+        """, (token_id, expires_at))
+        self._add(token_id, expires_at)
+        return row is not None
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._revoked)}
+
+
+revocation_list = RevocationList()
+
+
+class RefreshTokenError(Exception):
+    pass
+
+
+async def rotate_refresh_token(database, refresh_token: str):
+    """
+    Valida un refresh token, lo revoca y emite un par nuevo de la misma
+    familia. Si el token ya se había usado se asume que fue robado y se
+    revoca toda la familia
+    """
+    payload = verify_token(refresh_token)
+    if payload is None or payload.get('type') != 'refresh':
+        raise RefreshTokenError("Invalid refresh token")
+
+    token_id, family = payload['jti'], payload['fam']
+    if family in revocation_list:
+        raise RefreshTokenError("Refresh token revoked")
+    revoked = await revocation_list.revoked(database, token_id, family)
+    if family in revoked:
+        raise RefreshTokenError("Refresh token revoked")
+    if token_id in revoked or not await revocation_list.revoke(
+            database, token_id, payload['exp']):
+        await revocation_list.revoke(database, family, time.time() + REFRESH_TOKEN_TTL)
+        raise RefreshTokenError("Refresh token reused")
+
+    return issue_tokens(payload['username'], family)
+
+
+async def revoke_refresh_token(database, refresh_token: str):
+    """
+    Cierra la familia del refresh token (logout)
+    """
+    payload = verify_token(refresh_token)
+    if payload is None or payload.get('type') != 'refresh':
+        raise RefreshTokenError("Invalid refresh token")
+    await revocation_list.revoke(database, payload['fam'],
+                                 time.time() + REFRESH_TOKEN_TTL)
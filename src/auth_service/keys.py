@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import threading
+import time
+from os import getenv
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from dotenv import load_dotenv
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+load_dotenv()
+
+# Directorio con las claves privadas en PEM, una por archivo; el nombre del
+# archivo sin extensión es el `kid`. Firma la clave JWT_ACTIVE_KID o, si no
+# se indica, la última en orden alfabético. Las demás se siguen publicando en
+# el JWKS para que los tokens ya emitidos con ellas sigan siendo válidos
+JWT_KEYS_DIR = getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = getenv("JWT_ACTIVE_KID")
+# Tipo de la clave efímera que se genera si no hay JWT_KEYS_DIR
+ALGORITHM = getenv("ALGORITHM", "RS256")
+KEYS_RELOAD_INTERVAL = float(getenv("KEYS_RELOAD_INTERVAL", "30"))
+
+logger = logging.getLogger("auth_service.keys")
+
+
+def key_algorithm(private_key):
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return "RS256"
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return "EdDSA"
+    raise ValueError(f"Tipo de clave no soportado: {type(private_key).__name__}")
+
+
+def generate_key(algorithm):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"ALGORITHM no soportado: '{algorithm}' (usar RS256 o EdDSA)")
+
+
+def public_jwk(kid, private_key):
+    algorithm = key_algorithm(private_key)
+    codec = RSAAlgorithm if algorithm == "RS256" else OKPAlgorithm
+    jwk = json.loads(codec.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    return jwk
+
+
+class KeyStore:
+    """
+    Claves de firma de los tokens. Con un directorio, lo vuelve a leer como
+    mucho cada `reload_interval` segundos si cambió, así que rotar una clave
+    no requiere reiniciar el servicio
+    """
+
+    def __init__(self, keys_dir=None, active_kid=None, algorithm="RS256",
+                 reload_interval=30.0):
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._jwks = {"keys": []}
+        self._signing = None
+        self._fingerprint = None
+        self._next_check = 0.0
+
+        if keys_dir:
+            self._reload()
+        else:
+            logger.warning("JWT_KEYS_DIR no definido: se usa una clave efímera, "
+                           "válida solo con una réplica y hasta el próximo reinicio")
+            self._set_keys({"ephemeral": generate_key(algorithm)})
+
+    def _scan(self):
+        entries = sorted((e for e in os.scandir(self.keys_dir)
+                          if e.is_file() and e.name.endswith(".pem")),
+                         key=lambda e: e.name)
+        fingerprint = tuple((e.name, e.stat().st_mtime_ns) for e in entries)
+        return entries, fingerprint
+
+    def _reload(self):
+        entries, fingerprint = self._scan()
+        if fingerprint == self._fingerprint:
+            return
+        keys = {}
+        for entry in entries:
+            with open(entry.path, "rb") as f:
+                keys[entry.name[:-len(".pem")]] = load_pem_private_key(f.read(), None)
+        if not keys:
+            raise RuntimeError(f"No hay claves .pem en {self.keys_dir}")
+        self._set_keys(keys)
+        self._fingerprint = fingerprint
+        logger.info("claves de firma cargadas: %s (activa: %s)",
+                    ", ".join(keys), self._signing[0])
+
+    def _set_keys(self, keys):
+        kid = self.active_kid if self.active_kid in keys else sorted(keys)[-1]
+        self._keys = keys
+        self._signing = (kid, keys[kid], key_algorithm(keys[kid]))
+        self._jwks = {"keys": [public_jwk(k, key) for k, key in sorted(keys.items())]}
+
+    def _maybe_reload(self):
+        if not self.keys_dir:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            try:
+                self._reload()
+            except Exception as e:
+                # Si el directorio queda a medio escribir se siguen usando
+                # las claves anteriores
+                logger.error("no se pudieron recargar las claves: %s", e)
+
+    def signing_key(self):
+        """
+        Devuelve (kid, clave privada, algoritmo) de la clave activa
+        """
+        self._maybe_reload()
+        return self._signing
+
+    def verification_key(self, kid):
+        """
+        Clave pública y algoritmo de `kid`, o None si no se conoce
+        """
+        self._maybe_reload()
+        key = self._keys.get(kid)
+        if key is None:
+            return None
+        return key.public_key(), key_algorithm(key)
+
+    def jwks(self):
+        self._maybe_reload()
+        return self._jwks
+
+
+key_store = KeyStore(JWT_KEYS_DIR, JWT_ACTIVE_KID, ALGORITHM, KEYS_RELOAD_INTERVAL)
@@ -1,12 +1,58 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from routes import router
 import uvicorn
 import db
+import migrations
+import metrics
+from responses import FastJSONResponse
+from business_logic import hashing_pool, revocation_list, HashingOverloaded
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 app.include_router(router)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+metrics.register_stats("db_pool", db.pool_stats)
+metrics.register_stats("db_replicas", db.replica_stats)
+metrics.register_stats("hashing_pool", hashing_pool.stats)
+metrics.register_stats("revoked_tokens", revocation_list.stats)
 
 
 @app.on_event("startup")
-def startup():
-    db.init_db()
\ No newline at end of file
+async def startup():
+    await db.open_database()
+    await migrations.migrate(db.get_database())
+    await revocation_list.load(db.get_database())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await db.close_database()
+
+
+@app.exception_handler(db.PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: db.PoolTimeout):
+    return JSONResponse(status_code=503,
+                        content={"detail": "Service overloaded, try again later"})
+
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(status_code=503,
+                        content={"detail": "Service overloaded, try again later"},
+                        headers={"Retry-After": "1"})
+
+
+@app.get("/metrics/pool")
+def pool_metrics():
+    return db.pool_stats()
+
+
+@app.get("/metrics/replicas")
+def replica_metrics():
+    return db.replica_stats()
+
+
+@app.get("/metrics/hashing")
+def hashing_metrics():
+    return hashing_pool.stats()
@@ -0,0 +1,67 @@
+# Migraciones versionadas del esquema de auth_service. Cada una se aplica una
+# sola vez y queda registrada en `schema_migrations`, tabla compartida con
+# todo_service (la columna `service` separa las de cada servicio). Todas deben
+# ser idempotentes: también se aplican sobre bases creadas por el antiguo
+# init_db.
+
+SERVICE = "auth_service"
+
+# Clave del advisory lock que serializa las migraciones de todas las réplicas
+# y de ambos servicios, que comparten la misma base de datos
+LOCK_ID = 727001
+
+MIGRATIONS = [
+    (1, "crear tabla users", """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        );
+    """),
+    (2, "clave primaria id en users", """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS id BIGSERIAL PRIMARY KEY;
+    """),
+    (3, "lista de revocación de refresh tokens", """
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti UUID PRIMARY KEY,
+            expires_at TIMESTAMPTZ NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at_idx
+            ON revoked_tokens (expires_at);
+    """),
+]
+
+
+async def migrate(database):
+    """
+    Aplica en una única transacción las migraciones pendientes y devuelve
+    las versiones aplicadas. Si una falla, no se aplica ninguna
+    """
+    applied_now = []
+    async with database.transaction() as tx:
+        await tx.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_ID,))
+        await tx.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                service TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (service, version)
+            );
+        """)
+        rows = await tx.fetch_all(
+            "SELECT version FROM schema_migrations WHERE service = %s", (SERVICE,))
+        applied = {row["version"] for row in rows}
+
+        for version, description, sql in MIGRATIONS:
+            if version in applied:
+                continue
+            await tx.execute(sql)
+            await tx.execute(
+                "INSERT INTO schema_migrations (service, version, description) VALUES (%s, %s, %s)",
+                (SERVICE, version, description)
+            )
+            applied_now.append(version)
+            print(f"Migración {version} aplicada: {description}")
+
+    return applied_now
@@ -1,43 +1,77 @@
+import orjson
+from os import getenv
+from typing import Literal, Optional
 from fastapi import HTTPException
 from pathlib import Path
-from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, Form, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from starlette import status
 from fastapi.templating import Jinja2Templates
-import psycopg2
-from db import get_connection
-from business_logic import bcrypt_context, create_access_token
+from db import get_database, get_reader, DatabaseError, PoolTimeout
+from keys import key_store
+from responses import FastJSONResponse
+from business_logic import (issue_tokens, hash_password, verify_password,
+                            rotate_refresh_token, revoke_refresh_token,
+                            HashingOverloaded, RefreshTokenError)
 
 router = APIRouter(
     prefix='/auth',
     tags=['auth'],
 )
 
+USERS_PAGE_MAX = int(getenv("USERS_PAGE_MAX", "1000"))
+USERS_STREAM_BATCH = int(getenv("USERS_STREAM_BATCH", "500"))
+
+
+async def registration_conflict(database, username, email):
+    """
+    Devuelve el detalle del error si el username o el email ya están en uso.
+    Una sola consulta que usa los índices únicos de ambas columnas
+    """
+    row = await database.fetch_one("""
+        SELECT bool_or(username = %s) AS username_taken,
+               bool_or(email = %s) AS email_taken
+        FROM users WHERE username = %s OR email = %s
+    """, (username, email, username, email))
+    if row and row["username_taken"]:
+        return "Username already exists"
+    if row and row["email_taken"]:
+        return "Email already exists"
+    return None
+
 
 @router.post('/register', status_code=status.HTTP_201_CREATED)
 async def register_user(request: Request,
                         username: str = Form(...),
                         email: str = Form(...),
-                        password: str = Form(...)):
+                        password: str = Form(...),
+                        database=Depends(get_database)):
     """
-    Crea un nuevo usuario en la base de datos
+    Crea un nuevo usuario en la base de datos. Los conflictos se detectan
+    antes de pagar el coste de bcrypt; el INSERT con ON CONFLICT resuelve
+    de forma atómica las carreras entre registros simultáneos
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM users WHERE username = %s", (username,))
-            if cur.fetchone():
-                raise HTTPException(status_code=400, detail="Username already exists")
-            
-            hashed_password = bcrypt_context.hash(password)
-            cur.execute("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)", (username,email,hashed_password))
-            conn.commit()
-        conn.close()
+        conflict = await registration_conflict(database, username, email)
+        if conflict:
+            raise HTTPException(status_code=400, detail=conflict)
+
+        hashed_password = await hash_password(password)
+        created = await database.fetch_one("""
+            INSERT INTO users (username, email, password) VALUES (%s, %s, %s)
+            ON CONFLICT DO NOTHING RETURNING id
+        """, (username, email, hashed_password))
+
+        if created is None:
+            # Otro registro ganó la carrera entre la comprobación y el INSERT
+            conflict = await registration_conflict(database, username, email)
+            raise HTTPException(status_code=400,
+                                detail=conflict or "Username already exists")
 
         return {"message": "User registered successfully"}
 
-    except psycopg2.errors.UniqueViolation:
-        raise HTTPException(status_code=400, detail="Username already exists")
+    except (HTTPException, PoolTimeout, HashingOverloaded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,33 +81,163 @@ async def login_user(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
+    database=Depends(get_database),
+    reader=Depends(get_reader),
 ):
     """
-    Inicia sesión con el usuario y contraseña proporcionados.
+    Inicia sesión con el usuario y contraseña proporcionados. La contraseña
+    se lee de una réplica; si allí no autentica se repite en el primario,
+    porque una réplica atrasada puede no tener aún al usuario recién
+    registrado o su contraseña nueva
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT password FROM users WHERE username = %s", (username,))
-            row = cur.fetchone()
-        conn.close()
+        query = "SELECT password FROM users WHERE username = %s"
+        row = await reader.fetch_one(query, (username,))
+        if row and await verify_password(password, row["password"]):
+            return issue_tokens(username)
 
-        if row and bcrypt_context.verify(password, row["password"]):
-            return {"token": create_access_token(username)}
-        else:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+        current = await database.fetch_one(query, (username,))
+        if current and current != row and await verify_password(password, current["password"]):
+            return issue_tokens(username)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    except (HTTPException, PoolTimeout, HashingOverloaded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/refresh")
+async def refresh_token(
+    request: Request,
+    refresh_token: str = Form(...),
+    database=Depends(get_database),
+):
+    """
+    Canjea un refresh token por un nuevo par de tokens. El refresh token
+    usado queda revocado (rotación), así que cada uno sirve una sola vez
+    """
+    try:
+        return await rotate_refresh_token(database, refresh_token)
+    except RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/logout")
+async def logout_user(
+    request: Request,
+    refresh_token: str = Form(...),
+    database=Depends(get_database),
+):
+    """
+    Revoca el refresh token y todos los que se obtuvieron rotándolo
+    """
+    try:
+        await revoke_refresh_token(database, refresh_token)
+        return {"message": "Logged out"}
+    except RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/.well-known/jwks.json")
+def jwks():
+    """
+    Claves públicas con las que otros servicios verifican los tokens
+    """
+    return key_store.jwks()
+
+
+def users_query(after: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Consulta keyset sobre el índice único de username: cada página empieza
+    después del último username de la anterior, sin OFFSET
+    """
+    query = "SELECT username, email FROM users"
+    params = []
+    if after is not None:
+        query += " WHERE username > %s"
+        params.append(after)
+    query += " ORDER BY username"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, tuple(params)
+
+
+async def first_batch(batches):
+    """
+    Pide el primer lote antes de empezar la respuesta, así la conexión se
+    toma del pool mientras aún se puede responder 503 o 500. Devuelve el
+    lote (None si no hay filas) y el generador con el resto
+    """
+    try:
+        return await batches.__anext__(), batches
+    except StopAsyncIteration:
+        return None, batches
+
+
+async def stream_users(first_rows, batches, as_ndjson):
+    """
+    Serializa los usuarios lote a lote desde un cursor del lado del servidor.
+    En JSON mantiene la forma {"users": [...]} de la respuesta sin paginar
+    """
+    async def all_batches():
+        if first_rows is not None:
+            yield first_rows
+            async for rows in batches:
+                yield rows
+
+    first = True
+    if not as_ndjson:
+        yield b'{"users": ['
+    try:
+        async for rows in all_batches():
+            if as_ndjson:
+                yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+            else:
+                # El lote se codifica como un array y se le quitan los corchetes
+                chunk = orjson.dumps(rows)[1:-1]
+                yield chunk if first else b"," + chunk
+                first = False
+    except DatabaseError as e:
+        # La respuesta ya empezó a enviarse: solo queda cortar el stream
+        print("Error al listar los usuarios:", e)
+        raise
+    if not as_ndjson:
+        yield b']}'
+
+
 @router.get("/users")
-async def get_users(request: Request):
+async def get_users(request: Request,
+                    limit: Optional[int] = Query(None, ge=1, le=USERS_PAGE_MAX),
+                    after: Optional[str] = None,
+                    format: Literal["json", "ndjson"] = "json",
+                    reader=Depends(get_reader)):
+    """
+    Lista los usuarios ordenados por username. Con `limit` devuelve una página
+    y `next_after` para pedir la siguiente; sin él, la lista completa se
+    envía en streaming (JSON o NDJSON) sin cargarla entera en memoria
+    """
     try:
-        conn = get_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT username, email FROM users")
-            users = cur.fetchall()
-        conn.close()
-        return {"users": users}
+        if limit is None:
+            media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+            first_rows, batches = await first_batch(
+                reader.stream(*users_query(after), batch_size=USERS_STREAM_BATCH))
+            return StreamingResponse(
+                stream_users(first_rows, batches, format == "ndjson"), media_type=media_type)
+
+        users = await reader.fetch_all(*users_query(after, limit))
+        next_after = users[-1]["username"] if len(users) == limit else None
+        return FastJSONResponse({"users": users, "next_after": next_after})
+    except PoolTimeout:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,71 @@
+import logging
+import math
+import os
+import tempfile
+from os import getenv
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PORT = int(getenv("PORT", "8000"))
+# Número de procesos uvicorn; "auto" = una por CPU disponible para el contenedor
+WEB_CONCURRENCY = getenv("WEB_CONCURRENCY", "1")
+
+logger = logging.getLogger("auth_service.serve")
+
+
+def available_cpus():
+    """
+    CPUs que puede usar el proceso: respeta la afinidad y el límite de CPU
+    del cgroup (resources.limits.cpu en Kubernetes), que os.cpu_count ignora
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count():
+    if WEB_CONCURRENCY == "auto":
+        return available_cpus()
+    return max(1, int(WEB_CONCURRENCY))
+
+
+def prepare_workers(workers):
+    """
+    Ajusta el entorno que heredan los procesos worker: reparte las CPUs de
+    bcrypt entre ellos y, sin JWT_KEYS_DIR, genera una única clave efímera
+    compartida, porque cada proceso generaría la suya y el JWKS que publica
+    uno no serviría para verificar los tokens firmados por otro
+    """
+    if getenv("HASH_WORKERS") is None:
+        os.environ["HASH_WORKERS"] = str(max(1, available_cpus() // workers))
+    if getenv("JWT_KEYS_DIR") is None:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+        if getenv("ALGORITHM", "RS256") == "EdDSA":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        keys_dir = tempfile.mkdtemp(prefix="jwt-keys-")
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption())
+        with open(os.path.join(keys_dir, "ephemeral.pem"), "wb") as f:
+            f.write(pem)
+        os.environ["JWT_KEYS_DIR"] = keys_dir
+        logger.warning("JWT_KEYS_DIR no definido: clave efímera compartida en %s", keys_dir)
+
+
+if __name__ == "__main__":
+    workers = worker_count()
+    if workers > 1:
+        prepare_workers(workers)
+    uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=workers)
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "todo_service"))
+sys.path.insert(0, os.path.join(BASE_DIR, "common"))
+
+import db  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+from responses import FastJSONResponse  # noqa: E402
+
+# Filas con la forma de GET /tasks y GET /auth/users, generadas en el
+# servidor para no depender de las tablas
+PAYLOADS = {
+    "tasks": """
+        SELECT i AS id, 'tarea ' || i AS title, repeat(md5(i::text), 2) AS description
+        FROM generate_series(1, %s) AS i
+    """,
+    "users": """
+        SELECT 'user_' || i AS username, 'user_' || i || '@example.com' AS email
+        FROM generate_series(1, %s) AS i
+    """,
+}
+
+
+def fetch_realdict(conn, query, rows):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, (rows,))
+        return cur.fetchall()
+
+
+def fetch_mapped(conn, query, rows):
+    with conn.cursor() as cur:
+        cur.execute(query, (rows,))
+        mapper = db.row_mapper(tuple(column.name for column in cur.description))
+        return list(map(mapper, cur.fetchall()))
+
+
+def wrap(payload, rows):
+    return {"users": rows, "next_after": None} if payload == "users" else rows
+
+
+# Serialización antes del cambio: /tasks devolvía JSONResponse (json.dumps)
+# y /auth/users un dict que FastAPI pasaba por jsonable_encoder
+def serialize_before(payload, rows):
+    content = wrap(payload, rows)
+    if payload == "users":
+        content = jsonable_encoder(content)
+    return json.dumps(content, ensure_ascii=False).encode()
+
+
+def serialize_after(payload, rows):
+    return FastJSONResponse(wrap(payload, rows)).body
+
+
+def measure(fn, runs):
+    """
+    Mediana del tiempo en ms y pico de memoria asignada en KiB de `fn`
+    """
+    fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 2), round(peak / 1024)
+
+
+def run_payload(conn, payload, rows, runs):
+    query = PAYLOADS[payload]
+    fetched_before = fetch_realdict(conn, query, rows)
+    fetched_after = fetch_mapped(conn, query, rows)
+    assert json.loads(serialize_before(payload, fetched_before)) == \
+        json.loads(serialize_after(payload, fetched_after))
+
+    result = {}
+    for stage, before, after in (
+            ("fetch", lambda: fetch_realdict(conn, query, rows),
+             lambda: fetch_mapped(conn, query, rows)),
+            ("serialize", lambda: serialize_before(payload, fetched_before),
+             lambda: serialize_after(payload, fetched_after)),
+            ("request", lambda: serialize_before(payload, fetch_realdict(conn, query, rows)),
+             lambda: serialize_after(payload, fetch_mapped(conn, query, rows)))):
+        ms_before, kib_before = measure(before, runs)
+        ms_after, kib_after = measure(after, runs)
+        result[stage] = {
+            "before_ms": ms_before, "after_ms": ms_after,
+            "before_peak_kib": kib_before, "after_peak_kib": kib_after,
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tiempo y memoria de leer y serializar listas grandes, "
+                    "antes y después de las filas en tupla y orjson")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--payloads", nargs="+", default=list(PAYLOADS),
+                        choices=list(PAYLOADS))
+    parser.add_argument("--output", help="escribir el resultado JSON en este archivo")
+    args = parser.parse_args(argv)
+
+    conn = db.dedicated_connection()
+    try:
+        results = {payload: run_payload(conn, payload, args.rows, args.runs)
+                   for payload in args.payloads}
+    finally:
+        conn.close()
+
+    print(f"{'payload':8} {'etapa':10} {'antes ms':>9} {'después ms':>11} "
+          f"{'antes KiB':>10} {'después KiB':>12}")
+    for payload, stages in results.items():
+        for stage, m in stages.items():
+            print(f"{payload:8} {stage:10} {m['before_ms']:>9} {m['after_ms']:>11} "
+                  f"{m['before_peak_kib']:>10} {m['after_peak_kib']:>12}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(results, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
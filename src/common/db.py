@@ -0,0 +1,814 @@
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache, partial
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from os import getenv
+from metrics import observe_query
+
+load_dotenv()
+
+# "sync": psycopg2 + ConnectionPool ejecutado en el threadpool
+# "async": psycopg 3 con AsyncConnectionPool, sin ocupar hilos
+DB_BACKEND = getenv("DB_BACKEND", "sync")
+POOL_MIN_SIZE = int(getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "5"))
+POOL_HEALTHCHECK_INTERVAL = float(getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+# Réplicas de solo lectura como "host[:puerto]" separados por comas; usan
+# el mismo DB_NAME, DB_USER y DB_PASSWORD que el primario
+DB_REPLICA_HOSTS = getenv("DB_REPLICA_HOSTS", "")
+# Segundos que una réplica caída queda fuera de la rotación
+REPLICA_EJECT_SECONDS = float(getenv("DB_REPLICA_EJECT_SECONDS", "30"))
+# TCP keepalive de las conexiones de larga duración (LISTEN). Sin él, una
+# conexión medio abierta tras el timeout de un NAT o balanceador, o tras un
+# failover sin RST, no se detecta nunca: el socket simplemente no recibe nada
+LISTEN_KEEPALIVE_IDLE = int(getenv("DB_LISTEN_KEEPALIVE_IDLE", "30"))
+LISTEN_KEEPALIVE_INTERVAL = 10
+LISTEN_KEEPALIVE_COUNT = 3
+
+
+class PoolTimeout(Exception):
+    """
+    No se consiguió una conexión libre del pool dentro del tiempo límite
+    """
+
+
+class DatabaseError(Exception):
+    """
+    Error de la base de datos, independiente del driver usado
+    """
+
+
+class ConnectionFailed(DatabaseError):
+    """
+    No se pudo conectar con el servidor o se perdió la conexión
+    """
+
+
+class UniqueViolation(DatabaseError):
+    """
+    Se violó una restricción UNIQUE; `constraint` indica cuál
+    """
+
+    def __init__(self, message, constraint=None):
+        super().__init__(message)
+        self.constraint = constraint
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe con tamaño mínimo y máximo configurable.
+    Cada request toma prestada una conexión y la devuelve al terminar; las
+    conexiones rotas se descartan y se reemplazan por otras nuevas.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 healthcheck_interval=30.0):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError(
+                f"Tamaño de pool inválido: min={min_size}, max={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_size)
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "peak_in_use": 0,
+            "wait_seconds": 0.0,
+        }
+
+        try:
+            for _ in range(min_size):
+                conn = self._new_connection()
+                self._idle.append((conn, time.monotonic()))
+        except psycopg2.OperationalError as e:
+            # La base de datos puede no estar lista todavía; las conexiones
+            # se abrirán bajo demanda en el primer checkout
+            print("No se pudo precargar el pool de conexiones:", e)
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._size += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._counters["discarded"] += 1
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._new_connection()
+            conn, last_used = item
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+            with self._lock:
+                self._counters["reconnects"] += 1
+
+    def acquire(self):
+        """
+        Toma una conexión del pool, esperando hasta `timeout` segundos si
+        todas están ocupadas
+        """
+        if self._closed:
+            raise PoolTimeout("El pool de conexiones está cerrado")
+
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self._waiting -= 1
+            self._counters["wait_seconds"] += time.monotonic() - start
+            if not acquired:
+                self._counters["timeouts"] += 1
+        if not acquired:
+            raise PoolTimeout(
+                f"No hay conexiones libres tras {self.timeout}s de espera")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._counters["checkouts"] += 1
+            self._counters["peak_in_use"] = max(
+                self._counters["peak_in_use"], self._in_use)
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Devuelve la conexión al pool. Si quedó en un estado inválido se
+        cierra para que el siguiente checkout abra una nueva
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def stats(self):
+        """
+        Métricas de uso y saturación del pool
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "saturation": self._in_use / self.max_size,
+            })
+        return stats
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_database = None
+_reader = None
+
+
+def _connect(host=None, port=None, **kwargs):
+    return psycopg2.connect(
+        host=host or getenv("DB_HOST"),
+        port=port or getenv("DB_PORT"),
+        database=getenv("DB_NAME"),
+        user=getenv("DB_USER"),
+        password=getenv("DB_PASSWORD"),
+        **kwargs
+    )
+
+
+def dedicated_connection():
+    """
+    Conexión psycopg2 al primario fuera del pool y en autocommit, para usos
+    de larga duración como LISTEN. Con los keepalives, una conexión muerta
+    da error en el socket en unos LISTEN_KEEPALIVE_IDLE + 30 segundos en
+    lugar de quedar esperando para siempre. Quien la abre debe cerrarla
+    """
+    conn = _connect(keepalives=1,
+                    keepalives_idle=LISTEN_KEEPALIVE_IDLE,
+                    keepalives_interval=LISTEN_KEEPALIVE_INTERVAL,
+                    keepalives_count=LISTEN_KEEPALIVE_COUNT)
+    conn.autocommit = True
+    return conn
+
+
+def _replica_hosts():
+    """
+    Lista de (host, puerto) de DB_REPLICA_HOSTS
+    """
+    hosts = []
+    for item in DB_REPLICA_HOSTS.split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(":")
+            hosts.append((host, port or None))
+    return hosts
+
+
+@contextmanager
+def _psycopg2_errors():
+    """
+    Traduce los errores de psycopg2 a las excepciones de este módulo
+    """
+    try:
+        yield
+    except psycopg2.errors.UniqueViolation as e:
+        raise UniqueViolation(str(e), e.diag.constraint_name) from e
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        raise ConnectionFailed(str(e)) from e
+    except psycopg2.Error as e:
+        raise DatabaseError(str(e)) from e
+
+
+@contextmanager
+def _psycopg_errors():
+    """
+    Traduce los errores de psycopg 3 y psycopg_pool a las excepciones de
+    este módulo
+    """
+    import psycopg
+    import psycopg_pool
+
+    try:
+        yield
+    except psycopg_pool.PoolTimeout as e:
+        raise PoolTimeout(str(e)) from e
+    except psycopg.errors.UniqueViolation as e:
+        raise UniqueViolation(str(e), e.diag.constraint_name) from e
+    except (psycopg.OperationalError, psycopg.InterfaceError) as e:
+        raise ConnectionFailed(str(e)) from e
+    except psycopg.Error as e:
+        raise DatabaseError(str(e)) from e
+
+
+@lru_cache(maxsize=256)
+def row_mapper(columns):
+    """
+    Función que convierte una fila en tupla en un dict con las claves
+    `columns`, reutilizada por cada conjunto de columnas. dict(zip(...))
+    construye el dict en C, mucho más barato que RealDictCursor, que asigna
+    columna a columna en Python
+    """
+    def mapper(row):
+        return dict(zip(columns, row))
+    return mapper
+
+
+def _mapper(description):
+    return row_mapper(tuple(column.name for column in description))
+
+
+def _mapped_row(cursor):
+    """
+    row_factory de psycopg 3 equivalente a dict_row, con el mapeo reutilizado
+    """
+    if cursor.description is None:
+        return tuple
+    return _mapper(cursor.description)
+
+
+def _close_quietly(resource):
+    try:
+        resource.close()
+    except psycopg2.Error:
+        pass
+
+
+def _run_sync(conn, query, params, fetch):
+    started = time.perf_counter()
+    try:
+        with _psycopg2_errors():
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                if fetch == "all":
+                    rows = cur.fetchall()
+                    return list(map(_mapper(cur.description), rows))
+                if fetch == "one":
+                    row = cur.fetchone()
+                    return None if row is None else _mapper(cur.description)(row)
+                return cur.rowcount
+    finally:
+        observe_query(query, started)
+
+
+class SyncTransaction:
+    """
+    Sentencias sobre una misma conexión psycopg2, ejecutadas en el threadpool
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def fetch_all(self, query, params=None):
+        return await run_in_threadpool(_run_sync, self.conn, query, params, "all")
+
+    async def fetch_one(self, query, params=None):
+        return await run_in_threadpool(_run_sync, self.conn, query, params, "one")
+
+    async def execute(self, query, params=None):
+        return await run_in_threadpool(_run_sync, self.conn, query, params, None)
+
+
+class SyncDatabase:
+    """
+    Backend psycopg2: cada consulta toma una conexión del ConnectionPool
+    y se ejecuta en el threadpool para no bloquear el event loop
+    """
+
+    backend = "sync"
+
+    def __init__(self, host=None, port=None):
+        self.host = host or getenv("DB_HOST")
+        self.port = port or getenv("DB_PORT")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ConnectionPool(
+                    partial(_connect, self.host, self.port),
+                    min_size=POOL_MIN_SIZE,
+                    max_size=POOL_MAX_SIZE,
+                    timeout=POOL_TIMEOUT,
+                    healthcheck_interval=POOL_HEALTHCHECK_INTERVAL
+                )
+            return self._pool
+
+    def _close_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    async def open(self):
+        await run_in_threadpool(self._get_pool)
+
+    async def close(self):
+        await run_in_threadpool(self._close_pool)
+
+    def _run(self, query, params, fetch):
+        # El translator exterior cubre los fallos al abrir la conexión
+        with _psycopg2_errors(), self._get_pool().connection() as conn:
+            result = _run_sync(conn, query, params, fetch)
+            with _psycopg2_errors():
+                conn.commit()
+            return result
+
+    async def fetch_all(self, query, params=None):
+        return await run_in_threadpool(self._run, query, params, "all")
+
+    async def fetch_one(self, query, params=None):
+        return await run_in_threadpool(self._run, query, params, "one")
+
+    async def execute(self, query, params=None):
+        """
+        Ejecuta una sentencia, hace commit y devuelve las filas afectadas
+        """
+        return await run_in_threadpool(self._run, query, params, None)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Agrupa varias sentencias en una transacción: commit al salir del
+        bloque, rollback si se produce una excepción
+        """
+        pool = self._get_pool()
+        with _psycopg2_errors():
+            conn = await run_in_threadpool(pool.acquire)
+        try:
+            yield SyncTransaction(conn)
+            with _psycopg2_errors():
+                await run_in_threadpool(conn.commit)
+        finally:
+            await run_in_threadpool(pool.release, conn)
+
+    async def stream(self, query, params=None, batch_size=500):
+        """
+        Devuelve las filas en lotes de `batch_size` con un cursor del lado del
+        servidor, sin cargar el resultado completo en memoria. La conexión
+        queda ocupada hasta que se consume o se cierra el generador
+        """
+        pool = self._get_pool()
+        with _psycopg2_errors():
+            conn = await run_in_threadpool(pool.acquire)
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        try:
+            started = time.perf_counter()
+            with _psycopg2_errors():
+                await run_in_threadpool(cur.execute, query, params)
+            observe_query(query, started)
+            while True:
+                with _psycopg2_errors():
+                    rows = await run_in_threadpool(cur.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield list(map(_mapper(cur.description), rows))
+        finally:
+            await run_in_threadpool(_close_quietly, cur)
+            await run_in_threadpool(pool.release, conn)
+
+    def stats(self):
+        stats = self._get_pool().stats()
+        stats["backend"] = self.backend
+        return stats
+
+
+class AsyncTransaction:
+    """
+    Sentencias sobre una misma conexión psycopg 3 asíncrona
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def _run(self, query, params, fetch):
+        started = time.perf_counter()
+        try:
+            with _psycopg_errors():
+                async with self.conn.cursor() as cur:
+                    await cur.execute(query, params)
+                    if fetch == "all":
+                        return await cur.fetchall()
+                    if fetch == "one":
+                        return await cur.fetchone()
+                    return cur.rowcount
+        finally:
+            observe_query(query, started)
+
+    async def fetch_all(self, query, params=None):
+        return await self._run(query, params, "all")
+
+    async def fetch_one(self, query, params=None):
+        return await self._run(query, params, "one")
+
+    async def execute(self, query, params=None):
+        return await self._run(query, params, None)
+
+
+class AsyncDatabase:
+    """
+    Backend psycopg 3 asíncrono. Las consultas usan los mismos placeholders
+    (%s) que psycopg2, así que el SQL se comparte entre ambos backends
+    """
+
+    backend = "async"
+
+    def __init__(self, host=None, port=None):
+        from psycopg_pool import AsyncConnectionPool
+
+        self.host = host or getenv("DB_HOST")
+        self._pool = AsyncConnectionPool(
+            "",
+            kwargs={
+                "host": self.host,
+                "port": port or getenv("DB_PORT"),
+                "dbname": getenv("DB_NAME"),
+                "user": getenv("DB_USER"),
+                "password": getenv("DB_PASSWORD"),
+                "row_factory": _mapped_row,
+            },
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            timeout=POOL_TIMEOUT,
+            check=AsyncConnectionPool.check_connection,
+            open=False
+        )
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+
+    async def open(self):
+        async with self._open_lock:
+            if not self._opened:
+                await self._pool.open()
+                self._opened = True
+
+    async def close(self):
+        if self._opened:
+            await self._pool.close()
+            self._opened = False
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Agrupa varias sentencias en una transacción: commit al salir del
+        bloque, rollback si se produce una excepción
+        """
+        await self.open()
+        with _psycopg_errors():
+            async with self._pool.connection() as conn:
+                yield AsyncTransaction(conn)
+
+    async def fetch_all(self, query, params=None):
+        async with self.transaction() as tx:
+            return await tx.fetch_all(query, params)
+
+    async def fetch_one(self, query, params=None):
+        async with self.transaction() as tx:
+            return await tx.fetch_one(query, params)
+
+    async def execute(self, query, params=None):
+        """
+        Ejecuta una sentencia, hace commit y devuelve las filas afectadas
+        """
+        async with self.transaction() as tx:
+            return await tx.execute(query, params)
+
+    async def stream(self, query, params=None, batch_size=500):
+        """
+        Devuelve las filas en lotes de `batch_size` con un cursor del lado del
+        servidor, sin cargar el resultado completo en memoria
+        """
+        await self.open()
+        with _psycopg_errors():
+            async with self._pool.connection() as conn:
+                async with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                    started = time.perf_counter()
+                    await cur.execute(query, params)
+                    observe_query(query, started)
+                    while True:
+                        rows = await cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield rows
+
+    def stats(self):
+        raw = self._pool.get_stats()
+        size = raw.get("pool_size", 0)
+        idle = raw.get("pool_available", 0)
+        return {
+            "backend": self.backend,
+            "min_size": raw.get("pool_min", POOL_MIN_SIZE),
+            "max_size": raw.get("pool_max", POOL_MAX_SIZE),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiting": raw.get("requests_waiting", 0),
+            "checkouts": raw.get("requests_num", 0),
+            "timeouts": raw.get("requests_errors", 0),
+            "reconnects": raw.get("connections_lost", 0),
+            "saturation": (size - idle) / (raw.get("pool_max") or POOL_MAX_SIZE),
+        }
+
+
+class ReplicaRouter:
+    """
+    Reparte las consultas de solo lectura entre las réplicas en round-robin.
+    Una réplica que falla al conectar o agota la espera del pool (psycopg 3
+    reintenta la conexión en segundo plano y solo devuelve PoolTimeout) sale
+    de la rotación durante `eject_seconds` y la consulta se repite en el
+    primario. Sin réplicas todas las lecturas van al primario.
+
+    Para leer las propias escrituras se pasa `fresh=(query, params, minimum)`:
+    antes de la consulta se ejecuta `query` en la réplica elegida y, si su
+    primer valor es menor que `minimum` (la réplica aún no ha aplicado el
+    cambio), se lee del primario. El mínimo sale del primario, así que la
+    garantía vale entre procesos y pods sin estado compartido
+    """
+
+    def __init__(self, primary, replicas=(), eject_seconds=30.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._ejected_until = [0.0] * len(self.replicas)
+        self._counters = {
+            "replica_reads": 0,
+            "primary_reads": 0,
+            "lagging_reads": 0,
+            "ejections": 0,
+            "fallbacks": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _next_replica(self):
+        """
+        Índice de la siguiente réplica disponible, o None si no hay ninguna
+        """
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = next(self._turn) % len(self.replicas)
+            if self._ejected_until[index] <= now:
+                return index
+        return None
+
+    def _eject(self, index, error):
+        with self._lock:
+            self._ejected_until[index] = time.monotonic() + self.eject_seconds
+            self._counters["ejections"] += 1
+        print(f"Réplica {self.replicas[index].host} fuera de rotación:", error)
+
+    async def _is_fresh(self, replica, fresh):
+        if fresh is None:
+            return True
+        query, params, minimum = fresh
+        row = await replica.fetch_one(query, params)
+        current = next(iter(row.values())) if row else None
+        return (current or 0) >= minimum
+
+    async def _choose(self, fresh):
+        """
+        Índice de una réplica al día para esta lectura, o None si hay que ir
+        al primario
+        """
+        index = self._next_replica() if self.replicas else None
+        if index is not None:
+            try:
+                if await self._is_fresh(self.replicas[index], fresh):
+                    self._count("replica_reads")
+                    return index
+                self._count("lagging_reads")
+            except (ConnectionFailed, PoolTimeout) as e:
+                self._eject(index, e)
+                self._count("fallbacks")
+            return None
+        self._count("primary_reads")
+        return None
+
+    async def _read(self, method, query, params, fresh):
+        index = await self._choose(fresh)
+        if index is not None:
+            try:
+                return await getattr(self.replicas[index], method)(query, params)
+            except (ConnectionFailed, PoolTimeout) as e:
+                self._eject(index, e)
+                self._count("fallbacks")
+        return await getattr(self.primary, method)(query, params)
+
+    async def fetch_all(self, query, params=None, fresh=None):
+        return await self._read("fetch_all", query, params, fresh)
+
+    async def fetch_one(self, query, params=None, fresh=None):
+        return await self._read("fetch_one", query, params, fresh)
+
+    async def stream(self, query, params=None, batch_size=500, fresh=None):
+        """
+        Como Database.stream. Solo se puede pasar al primario si la réplica
+        falla antes de entregar el primer lote
+        """
+        index = await self._choose(fresh)
+        if index is not None:
+            delivered = False
+            try:
+                async for rows in self.replicas[index].stream(query, params, batch_size):
+                    delivered = True
+                    yield rows
+                return
+            except (ConnectionFailed, PoolTimeout) as e:
+                if delivered:
+                    raise
+                self._eject(index, e)
+                self._count("fallbacks")
+        async for rows in self.primary.stream(query, params, batch_size):
+            yield rows
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._counters)
+            stats["replicas"] = len(self.replicas)
+            stats["healthy_replicas"] = sum(1 for t in self._ejected_until if t <= now)
+        return stats
+
+
+def _create_backend(host=None, port=None):
+    if DB_BACKEND == "async":
+        return AsyncDatabase(host, port)
+    if DB_BACKEND == "sync":
+        return SyncDatabase(host, port)
+    raise ValueError(f"DB_BACKEND no soportado: '{DB_BACKEND}'")
+
+
+def get_database():
+    """
+    Devuelve el backend configurado en DB_BACKEND (se crea una sola vez)
+    """
+    global _database
+    if _database is None:
+        _database = _create_backend()
+    return _database
+
+
+def get_reader():
+    """
+    Router para consultas de solo lectura sobre las réplicas de
+    DB_REPLICA_HOSTS (se crea una sola vez)
+    """
+    global _reader
+    if _reader is None:
+        replicas = [_create_backend(host, port) for host, port in _replica_hosts()]
+        _reader = ReplicaRouter(get_database(), replicas, REPLICA_EJECT_SECONDS)
+    return _reader
+
+
+async def open_database():
+    await get_database().open()
+    for replica in get_reader().replicas:
+        try:
+            await replica.open()
+        except DatabaseError as e:
+            # Una réplica caída no impide arrancar: se usará el primario
+            print(f"No se pudo abrir la réplica {replica.host}:", e)
+
+
+async def close_database():
+    global _database, _reader
+    if _reader is not None:
+        for replica in _reader.replicas:
+            await replica.close()
+        _reader = None
+    if _database is not None:
+        await _database.close()
+        _database = None
+
+
+def pool_stats():
+    return get_database().stats()
+
+
+def replica_stats():
+    return get_reader().stats()
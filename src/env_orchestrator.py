@@ -1,7 +1,13 @@
+import hashlib
+import json
 import subprocess
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+import readiness
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -17,26 +23,279 @@ MINIKUBE_ENVIRONMENTS = {
     "auth-env": os.path.join(BASE_DIR, "k8s", "auth_service.yaml")
 }
 
-def wait_for_pod_ready(label, retries=10, delay=3):
-    if (label == "db-env"):
-        label = "db"
+# Nombre del Deployment (y de la etiqueta app=) de cada entorno
+APP_LABELS = {
+    "db-env": "db",
+    "auth-env": "auth-service",
+    "todo-env": "todo-service"
+}
+
+# Entornos que deben estar listos antes de desplegar cada uno
+DEPENDENCIES = {
+    "db-env": [],
+    "auth-env": ["db-env"],
+    "todo-env": ["db-env"]
+}
+
+READY_TIMEOUT = int(os.getenv("READY_TIMEOUT", "180"))
+
+# Carpeta (con su Dockerfile) e imagen de los entornos que se construyen. El
+# contexto de build es src/, porque las imágenes incluyen también common/
+SERVICE_DIRS = {
+    "auth-env": os.path.join(BASE_DIR, "auth_service"),
+    "todo-env": os.path.join(BASE_DIR, "todo_service")
+}
+COMMON_DIR = os.path.join(BASE_DIR, "common")
+
+IMAGES = {
+    "auth-env": "auth-service",
+    "todo-env": "todo-service"
+}
+
+# Variable con la que docker-compose.dev.yaml etiqueta la imagen de cada servicio
+COMPOSE_TAG_VARS = {
+    "auth-env": "AUTH_IMAGE_TAG",
+    "todo-env": "TODO_IMAGE_TAG"
+}
+
+# Huellas del último build/despliegue correcto de cada entorno
+FINGERPRINT_CACHE = os.getenv(
+    "FINGERPRINT_CACHE", os.path.join(BASE_DIR, ".orchestrator_cache.json"))
+
+_cache_lock = threading.Lock()
+
+
+def fingerprint(*paths):
+    """
+    SHA-256 del contenido de los archivos bajo `paths` (carpetas o archivos),
+    incluidas sus rutas relativas, ignorando el bytecode de Python
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.isfile(path):
+            files = [(os.path.basename(path), path)]
+        else:
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for name in names:
+                    if not name.endswith(".pyc"):
+                        full = os.path.join(root, name)
+                        files.append((os.path.relpath(full, path), full))
+        for relative, full in sorted(files):
+            digest.update(relative.encode() + b"\0")
+            with open(full, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load_fingerprints():
+    try:
+        with open(FINGERPRINT_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fingerprint(section, env_name, value):
+    """
+    Guarda la huella de un entorno. Se escribe en un archivo temporal y se
+    renombra para no dejar el cache a medias
+    """
+    with _cache_lock:
+        cache = load_fingerprints()
+        cache.setdefault(section, {})[env_name] = value
+        tmp_path = FINGERPRINT_CACHE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, FINGERPRINT_CACHE)
+
+
+def image_tag(env_name):
+    """
+    Etiqueta de la imagen derivada del contenido del servicio y de common/
+    """
+    return f"{IMAGES[env_name]}:{fingerprint(SERVICE_DIRS[env_name], COMMON_DIR)[:12]}"
+
+
+def build_image(env_name):
+    """
+    Construye la imagen del entorno si no existe ya una con la misma huella.
+    Devuelve la etiqueta o None si el build falla
+    """
+    tag = image_tag(env_name)
+    exists = subprocess.run(["docker", "image", "inspect", tag], capture_output=True)
+    if exists.returncode == 0:
+        print(f"[{env_name}] imagen {tag} sin cambios")
+        return tag
+    print(f"[{env_name}] construyendo {tag}")
+    result = subprocess.run(["docker", "build", "-t", tag, "-f",
+                             os.path.join(SERVICE_DIRS[env_name], "Dockerfile"), BASE_DIR])
+    return tag if result.returncode == 0 else None
+
+
+def render_manifest(env_name, tag=None):
+    """
+    Manifiesto del entorno con la imagen `:latest` sustituida por `tag`, de
+    modo que el pod template solo cambia (y hay rollout) si cambió el código
+    """
+    with open(MINIKUBE_ENVIRONMENTS[env_name]) as f:
+        manifest = f.read()
+    if tag:
+        manifest = manifest.replace(f"image: {IMAGES[env_name]}:latest", f"image: {tag}")
+    return manifest
+
 
-    if (label == "todo-env"):
-        label = "todo-service"
+def applied_generation(apply_output, name):
+    """
+    Generación del Deployment `name` según la salida de `kubectl apply -o json`
+    """
+    try:
+        applied = json.loads(apply_output)
+    except ValueError:
+        return None
+    for item in applied.get("items", [applied]):
+        metadata = item.get("metadata", {})
+        if item.get("kind") == "Deployment" and metadata.get("name") == name:
+            return metadata.get("generation")
+    return None
 
-    if (label == "auth-env"):
-        label = "auth-service"
 
-    for _ in range(retries):
-        result = subprocess.run(
-            ["kubectl", "get", "pods", "-l", f"app={label}",
-             "-o", "jsonpath={.items[0].status.containerStatuses[0].ready}"],
-            capture_output=True, text=True
-        )
-        if result.stdout.strip() == "true":
-            return True
-        time.sleep(delay)
-    return False
+def print_progress(name, state):
+    if state is None:
+        print(f"[{name}] eliminado")
+    else:
+        print(f"[{name}] {state['available']}/{state['desired']} réplicas disponibles")
+
+
+def resolve_order(targets):
+    """
+    Devuelve los entornos de `targets` más sus dependencias, en un orden en
+    el que cada uno aparece después de todas las suyas
+    """
+    order = []
+    visiting = set()
+
+    def visit(env_name):
+        if env_name in order:
+            return
+        if env_name in visiting:
+            raise ValueError(f"Dependencia circular en '{env_name}'")
+        visiting.add(env_name)
+        for dependency in DEPENDENCIES[env_name]:
+            visit(dependency)
+        visiting.discard(env_name)
+        order.append(env_name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+def deploy_and_wait(env_name, watch, timeout=READY_TIMEOUT):
+    """
+    Construye la imagen (si hace falta), aplica el manifiesto y espera en
+    `watch` a que el entorno esté listo. Si ni el código ni el manifiesto
+    cambiaron desde el último despliegue correcto, no se aplica nada.
+    Devuelve (listo, {fase: segundos})
+    """
+    timings = {}
+    name = APP_LABELS[env_name]
+    started = time.monotonic()
+    tag = None
+    if env_name in SERVICE_DIRS:
+        tag = build_image(env_name)
+        if tag is None:
+            print(f"[{env_name}] error al construir la imagen")
+            return False, timings
+    timings["build"] = time.monotonic() - started
+
+    manifest = render_manifest(env_name, tag)
+    deploy_hash = hashlib.sha256(manifest.encode()).hexdigest()
+    deployed = load_fingerprints().get("k8s", {}).get(env_name) == deploy_hash
+    generation = None
+
+    started = time.monotonic()
+    if deployed and subprocess.run(["kubectl", "get", "deployment", name],
+                                   capture_output=True).returncode == 0:
+        print(f"[{env_name}] sin cambios desde el último despliegue")
+    else:
+        result = subprocess.run(["kubectl", "apply", "-f", "-", "-o", "json"],
+                                input=manifest, capture_output=True, text=True)
+        if result.returncode != 0:
+            timings["apply"] = time.monotonic() - started
+            print(f"[{env_name}] error en kubectl apply: {result.stderr.strip()}")
+            return False, timings
+        generation = applied_generation(result.stdout, name)
+    timings["apply"] = time.monotonic() - started
+
+    started = time.monotonic()
+    ready = watch.wait_for({name: generation}, timeout)
+    timings["ready"] = time.monotonic() - started
+    if ready:
+        save_fingerprint("k8s", env_name, deploy_hash)
+    return ready, timings
+
+
+def run_graph(targets, action, max_workers=None):
+    """
+    Ejecuta `action(env_name)` para cada entorno en cuanto sus dependencias
+    terminan bien; los entornos independientes corren en paralelo. Si uno
+    falla, los que dependen de él se omiten. Devuelve {env: (ok, timings)}
+    """
+    order = resolve_order(targets)
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(order)) as executor:
+        while len(results) < len(order):
+            for env_name in order:
+                if env_name in results or env_name in running.values():
+                    continue
+                dependencies = DEPENDENCIES[env_name]
+                if any(d in results and not results[d][0] for d in dependencies):
+                    print(f"[{env_name}] omitido: falló una dependencia")
+                    results[env_name] = (False, {})
+                elif all(d in results for d in dependencies):
+                    print(f"[{env_name}] iniciando")
+                    running[executor.submit(action, env_name)] = env_name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                env_name = running.pop(future)
+                results[env_name] = future.result()
+                print(f"[{env_name}] {'listo' if results[env_name][0] else 'falló'}")
+    return results
+
+
+def print_timings(results, total):
+    phases = ("build", "apply", "ready")
+    print(f"{'entorno':<10} {'estado':<8} " + " ".join(f"{p:>8}" for p in phases))
+    for env_name, (ok, timings) in results.items():
+        columns = [f"{timings[p]:7.1f}s" if p in timings else f"{'-':>8}" for p in phases]
+        print(f"{env_name:<10} {'ok' if ok else 'error':<8} " + " ".join(columns))
+    print(f"Tiempo total: {total:.1f}s")
+
+
+def up(target):
+    """
+    Despliega en Minikube `target` (o todos con "all") junto con sus
+    dependencias, en paralelo donde el grafo lo permite
+    """
+    targets = list(DEPENDENCIES) if target == "all" else [target]
+    if any(t not in DEPENDENCIES for t in targets):
+        print(f"El entorno '{target}' no está definido.")
+        return False
+
+    started = time.monotonic()
+    # Un único watch sigue a todos los Deployments durante todo el despliegue
+    with readiness.DeploymentWatch(on_change=print_progress) as watch:
+        results = run_graph(targets, partial(deploy_and_wait, watch=watch))
+    print_timings(results, time.monotonic() - started)
+    subprocess.run(["minikube", "service", "list"])
+    return all(ok for ok, _ in results.values())
+
 
 def start_env(env_name):
     if env_name not in COMPOSE_ENVIRONMENTS:
@@ -45,10 +304,18 @@ def start_env(env_name):
     print(f"Iniciando entorno '{env_name}'")
     if env_name == "db-env":
         subprocess.run(["docker-compose", "-f", COMPOSE_ENVIRONMENTS[env_name], "up", "-d"])
-    elif env_name == "auth-env":
-        subprocess.run(["docker-compose", "-f", COMPOSE_ENVIRONMENTS[env_name], "up", "-d", "auth_service"])
-    elif env_name == "todo-env":
-        subprocess.run(["docker-compose", "-f", COMPOSE_ENVIRONMENTS[env_name], "up", "-d", "todo_service"])
+    else:
+        # Solo se reconstruye la imagen si cambió el contenido del servicio
+        service = os.path.basename(SERVICE_DIRS[env_name])
+        tag = image_tag(env_name).split(":", 1)[1]
+        env = dict(os.environ, **{COMPOSE_TAG_VARS[env_name]: tag})
+        command = ["docker-compose", "-f", COMPOSE_ENVIRONMENTS[env_name], "up", "-d"]
+        if load_fingerprints().get("compose", {}).get(env_name) != tag:
+            command.append("--build")
+        else:
+            print(f"Imagen de '{env_name}' sin cambios, se omite el build")
+        if subprocess.run(command + [service], env=env).returncode == 0:
+            save_fingerprint("compose", env_name, tag)
     subprocess.run(["docker", "ps"])
 
 
@@ -82,18 +349,10 @@ def deploy_service(env_name):
         return
     print(f"Desplegando servicio en el entorno '{env_name}'")
 
-    if env_name == "db-env":
-        subprocess.run(["kubectl", "apply", "-f", MINIKUBE_ENVIRONMENTS[env_name]])
-        if(wait_for_pod_ready(env_name)):
-            subprocess.run(["minikube", "service", "db","--url"])
-    elif env_name == "auth-env":
-        subprocess.run(["kubectl", "apply", "-f", MINIKUBE_ENVIRONMENTS[env_name]])
-        if(wait_for_pod_ready(env_name)):
-            subprocess.run(["minikube", "service", "auth-service", "--url"])
-    elif env_name == "todo-env":
-        subprocess.run(["kubectl", "apply", "-f", MINIKUBE_ENVIRONMENTS[env_name]])
-        if(wait_for_pod_ready(env_name)):
-            subprocess.run(["minikube", "service", "todo-service", "--url"])
+    with readiness.DeploymentWatch(on_change=print_progress) as watch:
+        ready, _ = deploy_and_wait(env_name, watch)
+    if ready:
+        subprocess.run(["minikube", "service", APP_LABELS[env_name], "--url"])
 
     print(f"Servicio en '{env_name}' desplegado correctamente.")
     subprocess.run(["minikube", "service", "list"])
@@ -117,6 +376,7 @@ if __name__ == "__main__":
         print("Comandos:")
         print("\tstart_env <env_name> \t Inicia un conjunto de servicios Docker Compose")
         print("\tstop_env <env_name> \t Detiene y elimina los servicios de Docker Compose")
+        print("\tup [all|<env_name>] \t Despliega en Minikube con sus dependencias, en paralelo")
     command = sys.argv[1]
     env_name = sys.argv[2] if len(sys.argv) > 2 else None
 
@@ -130,6 +390,9 @@ if __name__ == "__main__":
         deploy_service(env_name)
     elif command == "delete_service":
         delete_service(env_name)
+    elif command == "up":
+        if not up(env_name or "all"):
+            sys.exit(1)
     else:
         print(f"Comando '{command}' no reconocido")
         sys.exit(1)
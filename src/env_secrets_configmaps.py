@@ -1,6 +1,8 @@
 import os
 import sys
+import json
 import base64
+import hashlib
 import subprocess
 
 
@@ -11,6 +13,13 @@ SERVICES = {
     "db-env": ""
 }
 
+KUBECTL = os.getenv("KUBECTL", "kubectl")
+
+# Hash de cada manifiesto aplicado por última vez con el modo `all`
+APPLIED_CACHE = os.getenv(
+    "CONFIGMAPS_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".configmaps_cache.json"))
+
 
 def load_env(SERVICE_NAME):
     """
@@ -27,7 +36,7 @@ def load_env(SERVICE_NAME):
                 env_path = os.path.join(service_dir, fname)
                 break
 
-    if not os.path.isfile(env_path):
+    if env_path is None or not os.path.isfile(env_path):
         raise FileNotFoundError(
             f"No existe .env para '{SERVICE_NAME}' en {env_path}")
     env_data = {}
@@ -45,6 +54,51 @@ def load_env(SERVICE_NAME):
     return env_data
 
 
+def secret_manifest(name, env_data):
+    """
+    Secret con las variables SECRET_* del .env, codificadas en base64 como
+    exige la API de Kubernetes
+    """
+    data = {}
+    for key, value in env_data.items():
+        if key.startswith("SECRET_"):
+            data[key] = base64.b64encode(value.encode()).decode()
+    return {
+        "apiVersion": "v1",
+        "kind": "Secret",
+        "type": "Opaque",
+        "metadata": {"name": name},
+        "data": data
+    }
+
+
+def configmap_manifest(name, env_data):
+    """
+    ConfigMap con las variables del .env que no son secretas
+    """
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name},
+        "data": {k: v for k, v in env_data.items() if not k.startswith("SECRET_")}
+    }
+
+
+def to_yaml(manifest):
+    """
+    YAML de un manifiesto plano (ConfigMap o Secret). Los valores se
+    escriben como cadenas JSON, que también son escalares YAML válidos
+    """
+    lines = []
+    for key, value in manifest.items():
+        if isinstance(value, dict):
+            lines.append(f"{key}:")
+            lines += [f"  {k}: {json.dumps(v)}" for k, v in value.items()]
+        else:
+            lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
 def render_secret(name, env_data):
     """
     Cargamos un archivo YAML listo para que la API de Kubernets pueda
@@ -53,41 +107,81 @@ def render_secret(name, env_data):
     :param : 
     :return : YAML Secrets
     """
-    lines = [
-        "apiVersion: v1",
-        "kind: Secret",
-        "type: Opaque",
-        f"metadata:\n  name: {name}",
-        "data:"
-    ]
-    for key, value in env_data.items():
-        if not key.startswith("SECRET_"):
-            continue
-        B64 = base64.b64encode(value.encode()).decode()
-        lines.append(f"  {key}: \"{B64}\"")
-    return "\n".join(lines)
+    return to_yaml(secret_manifest(name, env_data))
 
 
 def render_configmap(name, data):
-    lines = [
-        "apiVersion: v1",
-        "kind: ConfigMap",
-        f"metadata:\n  name: {name}",
-        "data:"
-    ]
-    for k, v in data.items():
-        if k.startswith("SECRET_"):
+    return to_yaml(configmap_manifest(name, data))
+
+
+def manifest_hash(manifest):
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+
+
+def load_applied():
+    try:
+        with open(APPLIED_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_applied(applied):
+    tmp_path = APPLIED_CACHE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(applied, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, APPLIED_CACHE)
+
+
+def apply_all(force=False):
+    """
+    Genera el ConfigMap y el Secret de todos los servicios y aplica en una
+    sola llamada a `kubectl apply --server-side -f -` solo los que cambiaron
+    desde la última vez. Devuelve la lista de manifiestos aplicados
+    """
+    manifests = {}
+    for service in SERVICES:
+        try:
+            env_data = load_env(service)
+        except FileNotFoundError as e:
+            print(f"Omitiendo '{service}':", e)
             continue
-        lines.append(f"  {k}: \"{v}\"")
-    return "\n".join(lines)
+        for manifest in (configmap_manifest(f"{service}-config", env_data),
+                         secret_manifest(f"{service}-secret", env_data)):
+            manifests[f"{manifest['kind']}/{manifest['metadata']['name']}"] = manifest
+
+    applied = load_applied()
+    hashes = {key: manifest_hash(manifest) for key, manifest in manifests.items()}
+    changed = [key for key in manifests if force or applied.get(key) != hashes[key]]
+    if not changed:
+        print("Sin cambios: no hay manifiestos que aplicar")
+        return []
+
+    document = {"apiVersion": "v1", "kind": "List",
+                "items": [manifests[key] for key in changed]}
+    print("Aplicando:", ", ".join(changed))
+    subprocess.run([KUBECTL, "apply", "--server-side", "--force-conflicts",
+                    "--field-manager=env-secrets-configmaps", "-f", "-"],
+                   input=json.dumps(document), text=True, check=True)
+
+    applied.update({key: hashes[key] for key in changed})
+    save_applied(applied)
+    return changed
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python env_secrets_configmaps.py <service_name>")
+    if len(sys.argv) < 2:
+        print("Uso: python env_secrets_configmaps.py <service_name> | all [--force]")
         print("Servicios disponibles:", ", ".join(SERVICES.keys()))
         sys.exit(1)
     SERVICE_NAME = sys.argv[1]
+    if SERVICE_NAME == "all":
+        try:
+            apply_all(force="--force" in sys.argv[2:])
+        except subprocess.CalledProcessError as e:
+            print(f"Error al aplicar manifiestos: {e}")
+            sys.exit(1)
+        return
     if SERVICE_NAME not in SERVICES:
         print(f"Servicio no reconocido: '{SERVICE_NAME}'")
         print("Escoge uno de:", ", ".join(SERVICES.keys()))
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "load_test_baseline.json")
+
+POSTGRES_IMAGE = "postgres:15"
+SERVICES = {
+    "auth": {"dir": "auth_service", "port": 18000},
+    "todo": {"dir": "todo_service", "port": 18002},
+}
+
+# Métricas donde un valor mayor es peor y métricas donde un valor menor es peor
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_KEYS = ("rps",)
+
+
+def percentile(sorted_values, pct):
+    """
+    Percentil por el método nearest-rank sobre una lista ya ordenada
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Resume las latencias (en segundos) de un escenario
+    """
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Devuelve la lista de regresiones respecto a la línea base: latencias que
+    suben o throughput que baja más de `tolerance` (0.2 = 20%)
+    """
+    regressions = []
+    for scenario, current in results.items():
+        reference = baseline.get(scenario)
+        if not reference:
+            continue
+        for key in LATENCY_KEYS:
+            if reference.get(key) and current[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}.{key}: {current[key]} > {reference[key]} (+{tolerance:.0%})")
+        for key in THROUGHPUT_KEYS:
+            if reference.get(key) and current[key] < reference[key] * (1 - tolerance):
+                regressions.append(
+                    f"{scenario}.{key}: {current[key]} < {reference[key]} (-{tolerance:.0%})")
+        if current["errors"] > reference.get("errors", 0):
+            regressions.append(
+                f"{scenario}.errors: {current['errors']} > {reference.get('errors', 0)}")
+    return regressions
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    async def call(self, coro, expected=(200, 201)):
+        started = time.perf_counter()
+        try:
+            response = await coro
+        except httpx.HTTPError:
+            self.errors += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.errors += 1
+        return response
+
+
+async def run_clients(concurrency, requests_per_client, client_fn):
+    recorder = Recorder()
+    started = time.perf_counter()
+    await asyncio.gather(*(client_fn(i, requests_per_client, recorder)
+                           for i in range(concurrency)))
+    return summarize(recorder.latencies, recorder.errors,
+                     time.perf_counter() - started)
+
+
+async def register_user(client, auth_url, username):
+    await client.post(f"{auth_url}/auth/register", data={
+        "username": username, "email": f"{username}@bench.local",
+        "password": "bench-password"})
+    response = await client.post(f"{auth_url}/auth/login", data={
+        "username": username, "password": "bench-password"})
+    return response.json()["token"]
+
+
+async def scenario_auth_storm(client, args):
+    """
+    Ráfaga de registros seguidos de logins del mismo usuario
+    """
+    auth_url = args.auth_url
+
+    async def worker(index, count, recorder):
+        for _ in range(count):
+            username = f"bench_{uuid.uuid4().hex[:12]}"
+            await recorder.call(client.post(f"{auth_url}/auth/register", data={
+                "username": username, "email": f"{username}@bench.local",
+                "password": "bench-password"}))
+            await recorder.call(client.post(f"{auth_url}/auth/login", data={
+                "username": username, "password": "bench-password"}))
+
+    return await run_clients(args.concurrency, args.auth_requests, worker)
+
+
+async def scenario_task_crud(client, args):
+    """
+    CRUD de tareas con una proporción de lecturas configurable
+    """
+    todo_url = args.todo_url
+    tokens = [await register_user(client, args.auth_url, f"crud_{uuid.uuid4().hex[:12]}")
+              for _ in range(args.concurrency)]
+
+    async def worker(index, count, recorder):
+        headers = {"Authorization": f"Bearer {tokens[index]}"}
+        own_ids = []
+        for _ in range(count):
+            if random.random() < args.read_ratio:
+                await recorder.call(client.get(f"{todo_url}/tasks", headers=headers))
+                continue
+            action = random.choice(("create", "update", "delete")) if own_ids else "create"
+            if action == "create":
+                title = uuid.uuid4().hex
+                response = await recorder.call(client.post(
+                    f"{todo_url}/tasks", headers=headers,
+                    json={"title": title, "description": "bench"}))
+                if response is not None and response.status_code == 200:
+                    page = await client.get(f"{todo_url}/tasks", headers=headers)
+                    own_ids = [task["id"] for task in page.json()]
+            elif action == "update":
+                await recorder.call(client.put(
+                    f"{todo_url}/tasks/{random.choice(own_ids)}", headers=headers,
+                    json={"title": uuid.uuid4().hex, "description": "bench"}))
+            else:
+                await recorder.call(client.delete(
+                    f"{todo_url}/tasks/{own_ids.pop()}", headers=headers))
+
+    return await run_clients(args.concurrency, args.crud_requests, worker)
+
+
+async def scenario_large_list(client, args):
+    """
+    Lectura repetida de la lista completa de un usuario con muchas tareas
+    """
+    todo_url = args.todo_url
+    token = await register_user(client, args.auth_url, f"large_{uuid.uuid4().hex[:12]}")
+    headers = {"Authorization": f"Bearer {token}"}
+    for start in range(0, args.large_tasks, 1000):
+        size = min(1000, args.large_tasks - start)
+        await client.post(f"{todo_url}/tasks:batch", headers=headers, json={
+            "tasks": [{"title": f"task-{start + i}", "description": "x" * 64}
+                      for i in range(size)]})
+
+    async def worker(index, count, recorder):
+        for _ in range(count):
+            await recorder.call(client.get(f"{todo_url}/tasks", headers=headers))
+
+    return await run_clients(args.concurrency, args.large_requests, worker)
+
+
+SCENARIOS = {
+    "auth_storm": scenario_auth_storm,
+    "task_crud": scenario_task_crud,
+    "large_list": scenario_large_list,
+}
+
+
+def start_postgres(port):
+    """
+    Levanta un Postgres desechable en Docker y devuelve el id del contenedor
+    """
+    container = subprocess.run(
+        ["docker", "run", "-d", "--rm", "-p", f"{port}:5432",
+         "-e", "POSTGRES_USER=bench", "-e", "POSTGRES_PASSWORD=bench",
+         "-e", "POSTGRES_DB=bench", POSTGRES_IMAGE],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    for _ in range(60):
+        ready = subprocess.run(
+            ["docker", "exec", container, "pg_isready", "-U", "bench", "-h", "127.0.0.1"],
+            capture_output=True)
+        if ready.returncode == 0:
+            return container
+        time.sleep(1)
+    subprocess.run(["docker", "stop", container], capture_output=True)
+    raise RuntimeError("Postgres no estuvo listo a tiempo")
+
+
+def start_service(name, env):
+    service = SERVICES[name]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(service["port"]), "--log-level", "warning"],
+        cwd=os.path.join(BASE_DIR, service["dir"]), env=env
+    )
+    url = f"http://127.0.0.1:{service['port']}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{url}/metrics/pool").status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f"El servicio {name} terminó al arrancar")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"El servicio {name} no respondió a tiempo")
+
+
+async def run_scenarios(args):
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        results = {}
+        for name in args.scenarios:
+            results[name] = await SCENARIOS[name](client, args)
+            print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+        return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de carga de auth_service y todo_service")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS),
+                        choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--auth-requests", type=int, default=10,
+                        help="registros+logins por cliente en auth_storm")
+    parser.add_argument("--crud-requests", type=int, default=100,
+                        help="operaciones por cliente en task_crud")
+    parser.add_argument("--read-ratio", type=float, default=0.8,
+                        help="proporción de lecturas en task_crud")
+    parser.add_argument("--large-tasks", type=int, default=5000,
+                        help="tareas del usuario de large_list")
+    parser.add_argument("--large-requests", type=int, default=20,
+                        help="lecturas por cliente en large_list")
+    parser.add_argument("--db-host",
+                        help="usar este Postgres en lugar de levantar uno en Docker")
+    parser.add_argument("--db-port", default="5432")
+    parser.add_argument("--db-name", default="bench")
+    parser.add_argument("--db-user", default="bench")
+    parser.add_argument("--db-password", default="bench")
+    parser.add_argument("--env", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="variable de entorno extra para los servicios")
+    parser.add_argument("--output", help="escribir el resultado JSON en este archivo")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="guardar el resultado como nueva línea base")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    container = None
+    processes = []
+    try:
+        if args.db_host is None:
+            args.db_port = "55432"
+            container = start_postgres(args.db_port)
+            args.db_host = "127.0.0.1"
+
+        env = dict(os.environ)
+        env.update({
+            "DB_HOST": args.db_host, "DB_PORT": args.db_port,
+            "DB_NAME": args.db_name, "DB_USER": args.db_user,
+            "DB_PASSWORD": args.db_password,
+            # Fuera de la imagen, el código compartido se importa desde common/
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [os.path.join(BASE_DIR, "common"), os.getenv("PYTHONPATH")])),
+        })
+        env.update(item.split("=", 1) for item in args.env)
+
+        # auth_service aplica sus migraciones antes de que arranque todo_service
+        auth_process, args.auth_url = start_service("auth", env)
+        processes.append(auth_process)
+        env["JWKS_URL"] = f"{args.auth_url}/auth/.well-known/jwks.json"
+        todo_process, args.todo_url = start_service("todo", env)
+        processes.append(todo_process)
+
+        results = asyncio.run(run_scenarios(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        if container:
+            subprocess.run(["docker", "stop", container], capture_output=True)
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(report + "\n")
+        print(f"Línea base guardada en {args.baseline}", file=sys.stderr)
+        return 0
+
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regresiones respecto a la línea base:", file=sys.stderr)
+            for regression in regressions:
+                print("\t- " + regression, file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+POSTGRES_IMAGE = "postgres:15"
+SERVICES = {
+    "auth_service": {"image": "auth-service", "port": 8000,
+                     "probe": "/auth/.well-known/jwks.json"},
+    "todo_service": {"image": "todo-service", "port": 8002,
+                     "probe": "/metrics/pool"},
+}
+
+
+def run(command, **kwargs):
+    return subprocess.run(command, capture_output=True, text=True, check=True, **kwargs)
+
+
+def build(service, tag):
+    started = time.monotonic()
+    run(["docker", "build", "-t", tag, "-f",
+         os.path.join(BASE_DIR, service, "Dockerfile"), BASE_DIR])
+    return time.monotonic() - started
+
+
+def image_size_mb(tag):
+    size = run(["docker", "image", "inspect", tag, "--format", "{{.Size}}"]).stdout
+    return round(int(size) / 1024 / 1024, 1)
+
+
+def start_postgres(network):
+    """
+    Postgres desechable en la red de las pruebas; devuelve el nombre del
+    contenedor, que es también su hostname dentro de la red
+    """
+    name = f"measure-db-{uuid.uuid4().hex[:8]}"
+    run(["docker", "run", "-d", "--rm", "--name", name, "--network", network,
+         "-e", "POSTGRES_USER=user", "-e", "POSTGRES_PASSWORD=password",
+         "-e", "POSTGRES_DB=tododb", POSTGRES_IMAGE])
+    for _ in range(60):
+        ready = subprocess.run(["docker", "exec", name, "pg_isready", "-U", "user",
+                                "-h", "127.0.0.1"], capture_output=True)
+        if ready.returncode == 0:
+            return name
+        time.sleep(1)
+    raise RuntimeError("Postgres no estuvo listo a tiempo")
+
+
+def time_to_first_200(tag, service, network, db_host, env, timeout):
+    """
+    Segundos desde `docker run` hasta la primera respuesta 200 del servicio
+    """
+    config = SERVICES[service]
+    host_port = config["port"] + 10000
+    command = ["docker", "run", "-d", "--rm", "--network", network,
+               "-p", f"{host_port}:{config['port']}",
+               "-e", f"DB_HOST={db_host}", "-e", "DB_PORT=5432",
+               "-e", "DB_NAME=tododb", "-e", "DB_USER=user", "-e", "DB_PASSWORD=password"]
+    for item in env:
+        command += ["-e", item]
+
+    started = time.monotonic()
+    container = run(command + [tag]).stdout.strip()
+    url = f"http://127.0.0.1:{host_port}{config['probe']}"
+    try:
+        while time.monotonic() - started < timeout:
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return time.monotonic() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        return None
+    finally:
+        subprocess.run(["docker", "stop", container], capture_output=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide el tamaño de las imágenes y su tiempo hasta el primer 200")
+    parser.add_argument("--services", nargs="+", default=list(SERVICES),
+                        choices=list(SERVICES))
+    parser.add_argument("--runs", type=int, default=3,
+                        help="arranques por servicio; se informa la mediana")
+    parser.add_argument("--env", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="variable de entorno extra para los contenedores")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="escribir el resultado JSON en este archivo")
+    args = parser.parse_args(argv)
+
+    network = f"measure-{uuid.uuid4().hex[:8]}"
+    run(["docker", "network", "create", network])
+    db = None
+    results = {}
+    try:
+        db = start_postgres(network)
+        for service in args.services:
+            tag = f"{SERVICES[service]['image']}:measure"
+            build_seconds = build(service, tag)
+            startups = [time_to_first_200(tag, service, network, db, args.env, args.timeout)
+                        for _ in range(args.runs)]
+            measured = sorted(t for t in startups if t is not None)
+            results[service] = {
+                "image_size_mb": image_size_mb(tag),
+                "build_seconds": round(build_seconds, 1),
+                "time_to_first_200_seconds": (round(measured[len(measured) // 2], 2)
+                                              if measured else None),
+                "failed_starts": len(startups) - len(measured),
+            }
+            print(f"{service}: {json.dumps(results[service])}", file=sys.stderr)
+    finally:
+        if db:
+            subprocess.run(["docker", "stop", db], capture_output=True)
+        subprocess.run(["docker", "network", "rm", network], capture_output=True)
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    return 0 if all(r["failed_starts"] == 0 for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
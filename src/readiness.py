@@ -0,0 +1,199 @@
+import codecs
+import json
+import os
+import subprocess
+import threading
+
+WATCH_COMMAND = ["kubectl", "get", "deployments", "--watch", "--output=json",
+                 "--output-watch-events"]
+
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 8.0
+
+
+class JSONStreamParser:
+    """
+    Separa un flujo de texto en objetos JSON consecutivos. `kubectl get -w
+    -o json` emite objetos con formato de varias líneas sin delimitador, así
+    que se acumula el texto hasta que hay un objeto completo
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        objects = []
+        while True:
+            text = self._buffer.lstrip()
+            if not text:
+                self._buffer = ""
+                break
+            try:
+                obj, end = self._decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                # Objeto incompleto: se espera al siguiente fragmento
+                self._buffer = text
+                break
+            objects.append(obj)
+            self._buffer = text[end:]
+        return objects
+
+
+def deployment_status(deployment):
+    """
+    Resume el estado de un Deployment. Está listo cuando el controlador vio
+    la última versión del spec y todas las réplicas están actualizadas y
+    disponibles, sin réplicas antiguas pendientes de eliminar
+    """
+    metadata = deployment.get("metadata", {})
+    spec = deployment.get("spec", {})
+    status = deployment.get("status", {})
+    desired = spec.get("replicas", 1)
+    generation = metadata.get("generation", 0)
+    observed = status.get("observedGeneration", 0)
+    updated = status.get("updatedReplicas", 0)
+    available = status.get("availableReplicas", 0)
+    total = status.get("replicas", 0)
+    return {
+        "generation": generation,
+        "desired": desired,
+        "available": available,
+        "ready": (observed >= generation and updated == desired
+                  and available >= desired and total == desired),
+    }
+
+
+class KubectlStream:
+    """
+    Proceso `kubectl ... --watch` cuyo stdout se lee como fragmentos de texto
+    """
+
+    def __init__(self, command=None):
+        self.process = subprocess.Popen(
+            command or WATCH_COMMAND, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+
+    def __iter__(self):
+        fd = self.process.stdout.fileno()
+        # Un carácter multibyte puede quedar partido entre dos lecturas
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return
+            yield decoder.decode(chunk)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class DeploymentWatch:
+    """
+    Mantiene un único watch sobre los Deployments y el estado de cada uno.
+    Si el stream se corta se vuelve a abrir con espera exponencial; al
+    reconectar kubectl reenvía el estado actual de todos los objetos.
+    `open_stream` devuelve un iterable de fragmentos de texto con `close()`,
+    de modo que en las pruebas se puede sustituir por un stream falso
+    """
+
+    def __init__(self, open_stream=KubectlStream, backoff_initial=BACKOFF_INITIAL,
+                 backoff_max=BACKOFF_MAX, on_change=None):
+        self.open_stream = open_stream
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.on_change = on_change
+        self.reconnects = 0
+        self._states = {}
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None:
+            stream.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        delay = self.backoff_initial
+        while not self._stopped.is_set():
+            received = False
+            try:
+                self._stream = self.open_stream()
+                parser = JSONStreamParser()
+                for chunk in self._stream:
+                    for event in parser.feed(chunk):
+                        self._apply(event)
+                        received = True
+                    if self._stopped.is_set():
+                        break
+            except OSError:
+                pass
+            finally:
+                if self._stream is not None:
+                    self._stream.close()
+                    self._stream = None
+
+            if received:
+                delay = self.backoff_initial
+            if self._stopped.wait(delay):
+                break
+            delay = min(delay * 2, self.backoff_max)
+            self.reconnects += 1
+
+    def _apply(self, event):
+        kind = event.get("type")
+        deployment = event.get("object", event)
+        name = deployment.get("metadata", {}).get("name")
+        if name is None:
+            return
+        with self._condition:
+            if kind == "DELETED":
+                self._states.pop(name, None)
+            else:
+                self._states[name] = deployment_status(deployment)
+            state = self._states.get(name)
+            self._condition.notify_all()
+        if self.on_change:
+            self.on_change(name, state)
+
+    def _all_ready(self, targets):
+        for name, generation in targets.items():
+            state = self._states.get(name)
+            if state is None or not state["ready"]:
+                return False
+            if generation is not None and state["generation"] < generation:
+                return False
+        return True
+
+    def wait_for(self, targets, timeout):
+        """
+        Espera a que estén listos todos los Deployments de `targets`, un dict
+        {nombre: generación mínima o None}. La generación evita dar por listo
+        un Deployment con el estado anterior a un `kubectl apply` reciente.
+        Devuelve False si vence `timeout`
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._all_ready(targets), timeout)
+
+    def states(self):
+        with self._condition:
+            return dict(self._states)
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+import httpx
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JWKS_URL = getenv("JWKS_URL", "http://auth-service:8000/auth/.well-known/jwks.json")
+JWKS_TTL = float(getenv("JWKS_TTL", "300"))
+# Intervalo mínimo entre descargas forzadas por un `kid` desconocido, para
+# que tokens con `kid` inventados no se conviertan en peticiones a auth
+JWKS_MIN_REFRESH = float(getenv("JWKS_MIN_REFRESH", "10"))
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(getenv("TOKEN_CACHE_TTL", "300"))
+
+logger = logging.getLogger("todo_service.auth")
+
+
+class TokenCache:
+    """
+    Cache LRU de tokens ya verificados, indexada por el SHA-256 del token.
+    Una entrada vive como mucho `ttl` segundos y nunca más allá del `exp`
+    del propio token
+    """
+
+    def __init__(self, max_size=1024, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return payload
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key, payload: dict):
+        expires_at = time.time() + self.ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": self._hits / total if total else 0.0,
+            }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+class JWKSUnavailable(Exception):
+    """
+    No se pudo obtener el JWKS de auth_service y no hay claves en cache
+    """
+
+
+class JWKSCache:
+    """
+    Claves públicas de auth_service, descargadas de su JWKS. Se refrescan al
+    pasar `ttl` segundos o cuando llega un token firmado con un `kid`
+    desconocido (rotación de claves). Si la descarga falla se siguen usando
+    las claves anteriores
+    """
+
+    def __init__(self, url, ttl=300.0, min_refresh=10.0, fetch=None):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._fetch = fetch or self._fetch_http
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = asyncio.Lock()
+        self._refreshes = 0
+        self._errors = 0
+
+    async def _fetch_http(self):
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()
+
+    async def _refresh(self, fetched_before):
+        async with self._lock:
+            # Otra petición ya lo refrescó mientras esperábamos el lock
+            if self._fetched_at != fetched_before:
+                return
+            try:
+                jwks = await self._fetch()
+                self._keys = {jwk["kid"]: jwt.PyJWK(jwk) for jwk in jwks["keys"]}
+                self._refreshes += 1
+            except Exception as e:
+                self._errors += 1
+                logger.warning("no se pudo descargar el JWKS de %s: %s", self.url, e)
+                if not self._keys:
+                    raise JWKSUnavailable(str(e))
+            self._fetched_at = time.monotonic()
+
+    async def get(self, kid) -> jwt.PyJWK:
+        """
+        Devuelve la clave `kid`. Lanza jwt.InvalidTokenError si auth_service
+        no la publica
+        """
+        fetched_at = self._fetched_at
+        if fetched_at is None or time.monotonic() - fetched_at > self.ttl:
+            await self._refresh(fetched_at)
+        elif kid not in self._keys and time.monotonic() - fetched_at > self.min_refresh:
+            await self._refresh(fetched_at)
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"kid desconocido: {kid}")
+        return key
+
+    def stats(self):
+        age = None if self._fetched_at is None else time.monotonic() - self._fetched_at
+        return {
+            "keys": len(self._keys),
+            "age_seconds": age,
+            "ttl": self.ttl,
+            "refreshes": self._refreshes,
+            "errors": self._errors,
+        }
+
+
+jwks_cache = JWKSCache(JWKS_URL, JWKS_TTL, JWKS_MIN_REFRESH)
+
+
+async def decode_token(token: str) -> dict:
+    """
+    Devuelve el payload del token, verificando la firma solo si no está en
+    cache. Lanza las excepciones de PyJWT si el token no es válido
+    """
+    key = token_cache.key(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    kid = jwt.get_unverified_header(token).get("kid")
+    jwk = await jwks_cache.get(kid)
+    payload = jwt.decode(token, jwk.key, algorithms=[jwk.algorithm_name])
+    # Un refresh token solo se canjea en auth_service, no autoriza peticiones
+    if payload.get("type") == "refresh":
+        raise jwt.InvalidTokenError("refresh token usado como access token")
+    token_cache.put(key, payload)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("token verificado digest=%s username=%s",
+                     key.hex()[:16], payload.get("username"))
+    return payload
@@ -1,87 +1,330 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
-from os import getenv
 from fastapi import HTTPException
+from db import get_database, get_reader, DatabaseError, UniqueViolation
+from cache import task_cache
+from events import task_events
 
-load_dotenv()
 
-connection = psycopg2.connect(
-    host=getenv("DB_HOST"),
-    port=getenv("DB_PORT"),
-    database=getenv("DB_NAME"),
-    user=getenv("DB_USER"),
-    password=getenv("DB_PASSWORD"),
-    cursor_factory=RealDictCursor
-)
+async def _record_change(tx, username: str, op: str, ids):
+    """
+    Dentro de la transacción de la escritura: sube la versión de las tareas
+    del usuario y avisa a los clientes de /tasks/stream. Ambas cosas se
+    confirman o se descartan junto con el cambio
+    """
+    await tx.execute("""
+        INSERT INTO task_versions (username, version) VALUES (%s, 1)
+        ON CONFLICT (username) DO UPDATE SET version = task_versions.version + 1
+    """, (username,))
+    await task_events.publish(tx, username, op, ids)
 
-cursor = connection.cursor()
 
+_VERSION_QUERY = "SELECT version FROM task_versions WHERE username = %s"
 
-def get_tasks(username: str) -> list:
+
+async def get_task_version(username: str) -> int:
+    """
+    Versión de las tareas del usuario, que cambia con cada escritura. Se lee
+    del primario: es la base del ETag y de la cache, válidas así en todos
+    los procesos y réplicas
+    """
     try:
-        cursor.execute(
-            "SELECT id,title,description FROM Task WHERE username = %s", (username,))
-        return cursor.fetchall()
-    except psycopg2.Error as e:
+        row = await get_database().fetch_one(_VERSION_QUERY, (username,))
+    except DatabaseError as e:
+        print("Error al obtener la versión de las tareas", e)
+        raise HTTPException(
+            500, detail='Surgió un error en la base de datos al obtener las tareas')
+    return row["version"] if row else 0
+
+
+def _fresh(username: str, version: int = None):
+    """
+    Con la `version` leída del primario, una réplica que aún no la tiene no
+    sirve la lectura: el usuario ve siempre sus propias escrituras
+    """
+    if version is None:
+        return None
+    return _VERSION_QUERY, (username,), version
+
+
+def _tasks_query(username: str, after_id: int = None, limit: int = None):
+    """
+    Consulta keyset sobre el índice (username, id): cada página empieza
+    después del último id de la anterior, sin OFFSET
+    """
+    query = "SELECT id,title,description FROM Task WHERE username = %s"
+    params = [username]
+    if after_id is not None:
+        query += " AND id > %s"
+        params.append(after_id)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, tuple(params)
+
+
+async def get_tasks(username: str, limit: int = None, after_id: int = None,
+                    version: int = None) -> list:
+    """
+    Solo la lista completa de una `version` conocida pasa por la cache; las
+    páginas van a la base
+    """
+    cacheable = limit is None and after_id is None and version is not None
+    if cacheable:
+        tasks = await task_cache.read(username, version)
+        if tasks is not None:
+            return tasks
+    try:
+        tasks = await get_reader().fetch_all(
+            *_tasks_query(username, after_id, limit), fresh=_fresh(username, version))
+        if cacheable:
+            await task_cache.write(username, version, tasks)
+        return tasks
+    except DatabaseError as e:
         print("Error al obtener las tareas", e)
-        connection.rollback()
         raise HTTPException(
             500, detail='Surgió un error en la base de datos al obtener las tareas')
 
 
-def add_task(username: str, title: str, description: str):
+def _search_query(username: str, text: str, limit: int, after: tuple = None):
+    """
+    Búsqueda sobre la columna `search` (índice GIN) ordenada por relevancia.
+    La paginación es keyset sobre (rank, id): `after` es el par de la última
+    fila de la página anterior
+    """
+    query = """
+        SELECT id, title, description, rank FROM (
+            SELECT id, title, description, ts_rank_cd(search, q) AS rank
+            FROM Task, websearch_to_tsquery('spanish', %s) AS q
+            WHERE username = %s AND search @@ q
+        ) AS matches"""
+    params = [text, username]
+    if after is not None:
+        query += " WHERE rank < %s::real OR (rank = %s::real AND id > %s)"
+        params += [after[0], after[0], after[1]]
+    query += " ORDER BY rank DESC, id LIMIT %s"
+    params.append(limit)
+    return query, tuple(params)
+
+
+async def search_tasks(username: str, text: str, limit: int, after: tuple = None,
+                       version: int = None) -> list:
+    try:
+        return await get_reader().fetch_all(
+            *_search_query(username, text, limit, after), fresh=_fresh(username, version))
+    except DatabaseError as e:
+        print("Error al buscar las tareas", e)
+        raise HTTPException(
+            500, detail='Surgió un error en la base de datos al buscar las tareas')
+
+
+async def stream_tasks(username: str, after_id: int = None, batch_size: int = 500,
+                       version: int = None):
+    """
+    Genera las tareas del usuario en lotes con un cursor del lado del servidor
+    """
     try:
-        cursor.execute(
-            "INSERT INTO Task(username, title, description) VALUES (%s, %s, %s)",
-            (username, title, description)
-        )
-        connection.commit()
-
-    except psycopg2.errors.UniqueViolation:
-        connection.rollback()
+        async for rows in get_reader().stream(
+                *_tasks_query(username, after_id), batch_size=batch_size,
+                fresh=_fresh(username, version)):
+            yield rows
+    except DatabaseError as e:
+        # La respuesta ya empezó a enviarse: solo queda cortar el stream
+        print("Error al exportar las tareas", e)
+        raise
+
+
+async def add_task(username: str, title: str, description: str):
+    try:
+        async with get_database().transaction() as tx:
+            row = await tx.fetch_one(
+                "INSERT INTO Task(username, title, description) VALUES (%s, %s, %s) RETURNING id",
+                (username, title, description)
+            )
+            await _record_change(tx, username, "insert", [row["id"]])
+
+    except UniqueViolation:
         raise HTTPException(
             404, detail='Ya existe una tarea con ese titulo, eliga otro')
 
-    except psycopg2.Error as e:
+    except DatabaseError as e:
         print("Error al agregar la tarea: ", e)
-        connection.rollback()
         raise HTTPException(
             500, detail='Surgió un error en la base de datos durante la inserción')
 
 
-def update_task(task_id: int, title: str, description: str):
+async def update_task(task_id: int, title: str, description: str):
     try:
-        cursor.execute(
-            "UPDATE Task SET title = %s, description = %s WHERE id = %s",
-            (title, description, task_id)
-        )
-        connection.commit()
+        async with get_database().transaction() as tx:
+            row = await tx.fetch_one(
+                "UPDATE Task SET title = %s, description = %s WHERE id = %s RETURNING username",
+                (title, description, task_id)
+            )
 
-        if (cursor.rowcount == 0):
-            raise HTTPException(404, detail=f'No hay una tarea con el id {id}')
+            if row is None:
+                raise HTTPException(
+                    404, detail=f'No hay una tarea con el id {task_id}')
+            await _record_change(tx, row["username"], "update", [task_id])
 
-    except psycopg2.errors.UniqueViolation:
-        connection.rollback()
+    except UniqueViolation:
         raise HTTPException(
             404, detail='Ya existe una tarea con ese título, eliga otro')
-    except psycopg2.Error as e:
-        connection.rollback()
+    except DatabaseError as e:
         print("Error al actualizar la tarea:", e)
         raise HTTPException(
             500, detail='Surgió un error en la base de datos durante la actualizacion')
 
 
-def remove_task(task_id: int):
+async def remove_task(task_id: int):
     try:
-        cursor.execute("DELETE FROM Task WHERE id = %s", (task_id,))
-        connection.commit()
+        async with get_database().transaction() as tx:
+            row = await tx.fetch_one(
+                "DELETE FROM Task WHERE id = %s RETURNING username", (task_id,))
 
-        if (cursor.rowcount == 0):
-            raise HTTPException(
-                404, detail=f'No existe una tarea con el id {task_id}')
-    except psycopg2.Error as e:
+            if row is None:
+                raise HTTPException(
+                    404, detail=f'No existe una tarea con el id {task_id}')
+            await _record_change(tx, row["username"], "delete", [task_id])
+    except DatabaseError as e:
         print("Error al eliminar la tarea : ", e)
-        connection.rollback()
         raise HTTPException(
             500, detail='Surgió un error en la base de datos durante la eliminación')
+
+
+def _item_result(index: int, status: int, task_id: int = None, detail: str = None):
+    result = {"index": index, "status": status}
+    if task_id is not None:
+        result["id"] = task_id
+    if detail is not None:
+        result["detail"] = detail
+    return result
+
+
+async def add_tasks(username: str, tasks: list) -> list:
+    """
+    Inserta varias tareas con una sola sentencia multi-fila. Los títulos que
+    ya existen (o se repiten dentro del lote) se reportan por ítem con 409
+    """
+    try:
+        async with get_database().transaction() as tx:
+            rows = await tx.fetch_all(
+                """
+                INSERT INTO Task(username, title, description)
+                SELECT %s, t.title, t.description
+                FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS t(title, description, ord)
+                ORDER BY t.ord
+                ON CONFLICT (username, title) DO NOTHING
+                RETURNING id, title
+                """,
+                (username, [t["title"] for t in tasks], [t["description"] for t in tasks])
+            )
+            inserted = {row["title"]: row["id"] for row in rows}
+            if inserted:
+                await _record_change(tx, username, "insert", inserted.values())
+    except DatabaseError as e:
+        print("Error al agregar las tareas: ", e)
+        raise HTTPException(
+            500, detail='Surgió un error en la base de datos durante la inserción')
+
+    results = []
+    for index, task in enumerate(tasks):
+        task_id = inserted.pop(task["title"], None)
+        if task_id is None:
+            results.append(_item_result(
+                index, 409, detail='Ya existe una tarea con ese titulo, eliga otro'))
+        else:
+            results.append(_item_result(index, 201, task_id))
+    return results
+
+
+async def update_tasks(username: str, tasks: list) -> list:
+    """
+    Actualiza varias tareas del usuario en una transacción. Primero intenta
+    una única sentencia; si algún título choca, repite ítem a ítem con
+    savepoints para reportar el conflicto solo en los afectados
+    """
+    results = [None] * len(tasks)
+    seen = set()
+    pending = []
+    for index, task in enumerate(tasks):
+        if task["id"] in seen:
+            results[index] = _item_result(
+                index, 409, task["id"], 'La tarea aparece más de una vez en el lote')
+        else:
+            seen.add(task["id"])
+            pending.append((index, task))
+
+    try:
+        async with get_database().transaction() as tx:
+            await tx.execute("SAVEPOINT batch_update")
+            try:
+                rows = await tx.fetch_all(
+                    """
+                    UPDATE Task SET title = v.title, description = v.description
+                    FROM unnest(%s::int[], %s::text[], %s::text[]) AS v(id, title, description)
+                    WHERE Task.id = v.id AND Task.username = %s
+                    RETURNING Task.id
+                    """,
+                    ([t["id"] for _, t in pending], [t["title"] for _, t in pending],
+                     [t["description"] for _, t in pending], username)
+                )
+                updated = {row["id"] for row in rows}
+                conflicts = set()
+            except UniqueViolation:
+                await tx.execute("ROLLBACK TO SAVEPOINT batch_update")
+                updated, conflicts = set(), set()
+                for _, task in pending:
+                    await tx.execute("SAVEPOINT batch_item")
+                    try:
+                        if await tx.execute(
+                                "UPDATE Task SET title = %s, description = %s WHERE id = %s AND username = %s",
+                                (task["title"], task["description"], task["id"], username)):
+                            updated.add(task["id"])
+                    except UniqueViolation:
+                        await tx.execute("ROLLBACK TO SAVEPOINT batch_item")
+                        conflicts.add(task["id"])
+            if updated:
+                await _record_change(tx, username, "update", updated)
+    except DatabaseError as e:
+        print("Error al actualizar las tareas:", e)
+        raise HTTPException(
+            500, detail='Surgió un error en la base de datos durante la actualizacion')
+
+    for index, task in pending:
+        if task["id"] in updated:
+            results[index] = _item_result(index, 200, task["id"])
+        elif task["id"] in conflicts:
+            results[index] = _item_result(
+                index, 409, task["id"], 'Ya existe una tarea con ese título, eliga otro')
+        else:
+            results[index] = _item_result(
+                index, 404, task["id"], f'No hay una tarea con el id {task["id"]}')
+    return results
+
+
+async def remove_tasks(username: str, task_ids: list) -> list:
+    """
+    Elimina varias tareas del usuario con una sola sentencia
+    """
+    try:
+        async with get_database().transaction() as tx:
+            rows = await tx.fetch_all(
+                "DELETE FROM Task WHERE username = %s AND id = ANY(%s::int[]) RETURNING id",
+                (username, list(task_ids))
+            )
+            deleted = {row["id"] for row in rows}
+            if deleted:
+                await _record_change(tx, username, "delete", deleted)
+    except DatabaseError as e:
+        print("Error al eliminar las tareas : ", e)
+        raise HTTPException(
+            500, detail='Surgió un error en la base de datos durante la eliminación')
+
+    results = []
+    for index, task_id in enumerate(task_ids):
+        if task_id in deleted:
+            deleted.discard(task_id)
+            results.append(_item_result(index, 200, task_id))
+        else:
+            results.append(_item_result(
+                index, 404, task_id, f'No existe una tarea con el id {task_id}'))
+    return results
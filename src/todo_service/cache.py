@@ -0,0 +1,174 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory": LRU dentro del proceso (válida solo con un proceso en un único pod)
+# "redis": compartida entre procesos y réplicas, requiere REDIS_URL
+# "none": sin cache
+# Por defecto "redis" si hay REDIS_URL y si no "none": "memory" nunca se
+# elige sola, porque con varios pods serviría listas viejas sin avisar
+TASK_CACHE_BACKEND = getenv("TASK_CACHE_BACKEND") or ("redis" if getenv("REDIS_URL") else "none")
+TASK_CACHE_SIZE = int(getenv("TASK_CACHE_SIZE", "1024"))
+TASK_CACHE_TTL = float(getenv("TASK_CACHE_TTL", "30"))
+REDIS_URL = getenv("REDIS_URL", "redis://localhost:6379/0")
+
+logger = logging.getLogger("todo_service.cache")
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+
+# Todas las caches guardan la lista junto con la versión de las tareas del
+# usuario (tabla task_versions, leída del primario) y solo la sirven si se
+# pide esa misma versión. Una escritura sube la versión en su transacción,
+# así que no hace falta invalidar: la entrada vieja deja de coincidir en
+# todos los procesos y réplicas a la vez
+
+
+class MemoryTaskCache:
+    """
+    LRU en memoria con TTL, dentro del proceso
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_size=1024, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    async def read(self, username, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] == version and entry[2] > now:
+                self._entries.move_to_end(username)
+                self.stats.incr("hits")
+                return entry[1]
+        self.stats.incr("misses")
+        return None
+
+    async def write(self, username, version, tasks):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > version:
+                return
+            self._entries[username] = (version, tasks, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.incr("evictions")
+
+    def info(self):
+        with self._lock:
+            size = len(self._entries)
+        info = self.stats.as_dict()
+        info.update({"backend": self.backend, "size": size,
+                     "max_size": self.max_size, "ttl": self.ttl})
+        return info
+
+
+class RedisTaskCache:
+    """
+    Cache compartida entre procesos y réplicas. `client` es un cliente
+    redis.asyncio o un sustituto con la misma API
+    """
+
+    backend = "redis"
+
+    def __init__(self, client=None, ttl=30.0, prefix="tasks"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(REDIS_URL)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def _key(self, username):
+        return f"{self.prefix}:list:{username}"
+
+    async def read(self, username, version):
+        try:
+            raw = await self.client.get(self._key(username))
+        except Exception as e:
+            logger.warning("cache redis no disponible: %s", e)
+            self.stats.incr("errors")
+            return None
+
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry["version"] == version:
+                self.stats.incr("hits")
+                return entry["tasks"]
+        self.stats.incr("misses")
+        return None
+
+    async def write(self, username, version, tasks):
+        try:
+            await self.client.set(
+                self._key(username), json.dumps({"version": version, "tasks": tasks}),
+                px=int(self.ttl * 1000))
+        except Exception as e:
+            logger.warning("cache redis no disponible: %s", e)
+            self.stats.incr("errors")
+
+    def info(self):
+        info = self.stats.as_dict()
+        info.update({"backend": self.backend, "ttl": self.ttl})
+        return info
+
+
+class NullTaskCache:
+    backend = "none"
+
+    async def read(self, username, version):
+        return None
+
+    async def write(self, username, version, tasks):
+        pass
+
+    def info(self):
+        return {"backend": self.backend}
+
+
+def create_task_cache():
+    if TASK_CACHE_BACKEND == "memory":
+        return MemoryTaskCache(TASK_CACHE_SIZE, TASK_CACHE_TTL)
+    if TASK_CACHE_BACKEND == "redis":
+        return RedisTaskCache(ttl=TASK_CACHE_TTL)
+    if TASK_CACHE_BACKEND == "none":
+        return NullTaskCache()
+    raise ValueError(f"TASK_CACHE_BACKEND no soportado: '{TASK_CACHE_BACKEND}'")
+
+
+task_cache = create_task_cache()
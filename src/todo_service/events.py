@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+from os import getenv
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from db import dedicated_connection
+
+load_dotenv()
+
+# Canal de Postgres por el que se publican los cambios de tareas
+TASK_EVENTS_CHANNEL = "task_changes"
+# Eventos pendientes por cliente de /tasks/stream antes de pedirle resync
+TASKS_STREAM_QUEUE_SIZE = int(getenv("TASKS_STREAM_QUEUE_SIZE", "100"))
+# Clientes de /tasks/stream admitidos por proceso
+TASKS_STREAM_MAX_CLIENTS = int(getenv("TASKS_STREAM_MAX_CLIENTS", "1000"))
+# Segundos sin eventos tras los que se envía un comentario de keep-alive
+TASKS_STREAM_HEARTBEAT = float(getenv("TASKS_STREAM_HEARTBEAT", "15"))
+
+# El payload de NOTIFY está limitado a 8000 bytes: con más ids se publica
+# el cambio sin ellos y el cliente vuelve a pedir la lista
+NOTIFY_MAX_IDS = 500
+
+logger = logging.getLogger("todo_service.events")
+
+
+class TooManySubscribers(Exception):
+    """
+    Se alcanzó TASKS_STREAM_MAX_CLIENTS en este proceso
+    """
+
+
+class Subscription:
+    """
+    Cola acotada de eventos de un cliente. Si el cliente no consume a tiempo
+    se descartan sus eventos pendientes y se le envía un único `resync`, así
+    un cliente lento no retiene memoria ni frena a los demás
+    """
+
+    def __init__(self, username, queue_size):
+        self.username = username
+        self.queue = asyncio.Queue(queue_size)
+
+    def push(self, event, data):
+        """
+        Encola un evento; devuelve False si la cola estaba llena
+        """
+        try:
+            self.queue.put_nowait((event, data))
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", "{}"))
+            return False
+
+
+class TaskEventHub:
+    """
+    Reparte las notificaciones de `TASK_EVENTS_CHANNEL` entre los clientes
+    suscritos del proceso a partir de una única conexión con LISTEN. La
+    conexión se vigila desde el event loop con `add_reader`, sin hilos; si
+    se pierde se reabre con espera exponencial y todos los clientes reciben
+    `resync`, porque las notificaciones de mientras no se recuperan
+    """
+
+    def __init__(self, connect=dedicated_connection, channel=TASK_EVENTS_CHANNEL,
+                 queue_size=100, max_clients=1000, heartbeat=15.0,
+                 backoff_initial=0.5, backoff_max=30.0):
+        self.connect = connect
+        self.channel = channel
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.heartbeat = heartbeat
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._subscribers = {}
+        self._clients = 0
+        self._task = None
+        self._connected = False
+        self._counters = {
+            "notifications": 0,
+            "delivered": 0,
+            "overflows": 0,
+            "rejected": 0,
+            "reconnects": 0,
+        }
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _listen(self):
+        conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        delay = self.backoff_initial
+        first = True
+        while True:
+            try:
+                conn = await run_in_threadpool(self._listen)
+            except Exception as e:
+                logger.warning("no se pudo abrir LISTEN %s: %s", self.channel, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+                continue
+
+            delay = self.backoff_initial
+            if not first:
+                self._counters["reconnects"] += 1
+                self._broadcast("resync", "{}")
+            first = False
+
+            lost = asyncio.Event()
+            fd = conn.fileno()
+            loop.add_reader(fd, self._on_readable, conn, lost)
+            self._connected = True
+            try:
+                await lost.wait()
+            finally:
+                self._connected = False
+                loop.remove_reader(fd)
+                conn.close()
+
+    def _on_readable(self, conn, lost):
+        try:
+            conn.poll()
+        except Exception as e:
+            logger.warning("se perdió la conexión de LISTEN: %s", e)
+            lost.set()
+            return
+        while conn.notifies:
+            self.dispatch(conn.notifies.pop(0).payload)
+
+    def dispatch(self, payload):
+        """
+        Entrega una notificación a los clientes de su usuario
+        """
+        self._counters["notifications"] += 1
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            return
+        subscribers = self._subscribers.get(change.pop("username", None))
+        if not subscribers:
+            return
+        data = json.dumps(change)
+        for subscription in subscribers:
+            self._deliver(subscription, "task", data)
+
+    def _broadcast(self, event, data):
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                self._deliver(subscription, event, data)
+
+    def _deliver(self, subscription, event, data):
+        if subscription.push(event, data):
+            self._counters["delivered"] += 1
+        else:
+            self._counters["overflows"] += 1
+
+    def subscribe(self, username):
+        if self._clients >= self.max_clients:
+            self._counters["rejected"] += 1
+            raise TooManySubscribers(f"Máximo de {self.max_clients} clientes alcanzado")
+        subscription = Subscription(username, self.queue_size)
+        self._subscribers.setdefault(username, set()).add(subscription)
+        self._clients += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.username)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.username]
+        self._clients -= 1
+
+    async def sse(self, subscription):
+        """
+        Genera el flujo Server-Sent Events de una suscripción. El primer
+        evento, `ready`, indica que ya no se pierde ningún cambio: es el
+        momento de pedir la lista inicial
+        """
+        try:
+            yield "retry: 3000\nevent: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    async def publish(self, tx, username, op, ids):
+        """
+        Publica un cambio dentro de la transacción que lo escribe: Postgres
+        entrega el NOTIFY al hacer commit y lo descarta con el rollback, así
+        no hay avisos de cambios que no ocurrieron ni cambios sin aviso
+        """
+        ids = sorted(ids)
+        payload = json.dumps({
+            "username": username,
+            "op": op,
+            "ids": ids if len(ids) <= NOTIFY_MAX_IDS else None,
+        })
+        await tx.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats["connected"] = int(self._connected)
+        stats["clients"] = self._clients
+        stats["users"] = len(self._subscribers)
+        return stats
+
+
+task_events = TaskEventHub(queue_size=TASKS_STREAM_QUEUE_SIZE,
+                           max_clients=TASKS_STREAM_MAX_CLIENTS,
+                           heartbeat=TASKS_STREAM_HEARTBEAT)
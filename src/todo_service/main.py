@@ -1,28 +1,79 @@
 import jwt
-from fastapi import FastAPI, Depends, HTTPException
+import orjson
+import logging
+from typing import Annotated, List, Literal, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from business_logic import get_tasks, add_task, update_task, remove_task
+from pydantic import BaseModel, Field
+from business_logic import (get_tasks, stream_tasks, search_tasks, add_task, update_task,
+                            remove_task, add_tasks, update_tasks, remove_tasks,
+                            get_task_version)
 from dotenv import load_dotenv
 from os import getenv
 from contextlib import asynccontextmanager
 import db
+import migrations
+from auth import decode_token, token_cache, jwks_cache, JWKSUnavailable
+from cache import task_cache
+from events import task_events, TooManySubscribers
+import metrics
+from responses import FastJSONResponse
 
 load_dotenv()
 
+TASKS_PAGE_MAX = int(getenv("TASKS_PAGE_MAX", "1000"))
+TASKS_STREAM_BATCH = int(getenv("TASKS_STREAM_BATCH", "500"))
+TASKS_BATCH_MAX = int(getenv("TASKS_BATCH_MAX", "1000"))
+TASKS_SEARCH_LIMIT = int(getenv("TASKS_SEARCH_LIMIT", "20"))
+
+logging.basicConfig(
+    level=getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    db.init_db()
+    await db.open_database()
+    await migrations.migrate(db.get_database())
+    await task_events.start()
     yield
+    await task_events.stop()
+    await db.close_database()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+metrics.register_stats("db_pool", db.pool_stats)
+metrics.register_stats("db_replicas", db.replica_stats)
+metrics.register_stats("token_cache", token_cache.stats)
+metrics.register_stats("jwks", jwks_cache.stats)
+metrics.register_stats("task_cache", task_cache.info)
+metrics.register_stats("task_events", task_events.stats)
 
 security = HTTPBearer()
 
 
-SECRET_KEY = getenv("SECRET_KEY")
+@app.exception_handler(db.PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: db.PoolTimeout):
+    return JSONResponse(status_code=503,
+                        content={"detail": "Servicio saturado, intente más tarde"})
+
+
+@app.exception_handler(JWKSUnavailable)
+async def jwks_unavailable_handler(request: Request, exc: JWKSUnavailable):
+    return JSONResponse(status_code=503,
+                        content={"detail": "Servicio de autenticación no disponible"},
+                        headers={"Retry-After": "1"})
+
+
+@app.exception_handler(TooManySubscribers)
+async def too_many_subscribers_handler(request: Request, exc: TooManySubscribers):
+    return JSONResponse(status_code=503,
+                        content={"detail": "Servicio saturado, intente más tarde"},
+                        headers={"Retry-After": "5"})
 
 
 class Task(BaseModel):
@@ -30,12 +81,25 @@ class Task(BaseModel):
     description: str
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+class TaskWithId(Task):
+    id: int
+
+
+class TaskBatch(BaseModel):
+    tasks: Annotated[List[Task], Field(min_length=1, max_length=TASKS_BATCH_MAX)]
+
+
+class TaskUpdateBatch(BaseModel):
+    tasks: Annotated[List[TaskWithId], Field(min_length=1, max_length=TASKS_BATCH_MAX)]
+
+
+class TaskIdBatch(BaseModel):
+    ids: Annotated[List[int], Field(min_length=1, max_length=TASKS_BATCH_MAX)]
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        print(credentials.credentials)
-        payload = jwt.decode(credentials.credentials,
-                             SECRET_KEY, algorithms=["HS256"])
-        print("PAYLOAD:", payload)
+        payload = await decode_token(credentials.credentials)
         return payload["username"]
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
@@ -43,26 +107,165 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         raise HTTPException(status_code=401, detail="Token inválido")
 
 
+@app.get("/metrics/pool")
+def pool_metrics_endpoint():
+    return db.pool_stats()
+
+
+@app.get("/metrics/replicas")
+def replica_metrics_endpoint():
+    return db.replica_stats()
+
+
+@app.get("/metrics/token-cache")
+def token_cache_metrics_endpoint():
+    return token_cache.stats()
+
+
+@app.get("/metrics/jwks")
+def jwks_metrics_endpoint():
+    return jwks_cache.stats()
+
+
+@app.get("/metrics/task-cache")
+def task_cache_metrics_endpoint():
+    return task_cache.info()
+
+
+@app.get("/metrics/task-events")
+def task_events_metrics_endpoint():
+    return task_events.stats()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Comparación débil de If-None-Match (RFC 9110): admite una lista de
+    ETags, el prefijo W/ y `*`
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+async def ndjson_lines(batches):
+    async for rows in batches:
+        yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
 @app.get("/tasks")
-def get_tasks_endoint(user: str = Depends(verify_token)):
-    return get_tasks(user)
+async def get_tasks_endoint(request: Request,
+                            limit: Optional[int] = Query(None, ge=1, le=TASKS_PAGE_MAX),
+                            after_id: Optional[int] = Query(None, ge=0),
+                            format: Literal["json", "ndjson"] = "json",
+                            user: str = Depends(verify_token)):
+    """
+    Lista las tareas del usuario ordenadas por id. Con `limit` devuelve una
+    página y la cabecera X-Next-After-Id para pedir la siguiente; con
+    `format=ndjson` exporta todas las tareas en streaming, una por línea.
+    La respuesta lleva como ETag la versión de las tareas del usuario, que
+    sube con cada escritura; con If-None-Match se responde 304 consultando
+    solo esa versión
+    """
+    version = await get_task_version(user)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            ndjson_lines(stream_tasks(user, after_id, TASKS_STREAM_BATCH, version)),
+            media_type="application/x-ndjson", headers=headers)
+
+    tasks = await get_tasks(user, limit, after_id, version)
+    if limit is not None and len(tasks) == limit:
+        headers["X-Next-After-Id"] = str(tasks[-1]["id"])
+    # Devolver la respuesta ya construida evita que FastAPI recorra cada
+    # fila con jsonable_encoder antes de serializarla
+    return FastJSONResponse(tasks, headers=headers)
+
+
+def parse_search_cursor(cursor: str) -> tuple:
+    try:
+        rank, task_id = cursor.split(":")
+        return float(rank), int(task_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@app.get("/tasks/search")
+async def search_tasks_endpoint(q: str = Query(..., min_length=1, max_length=256),
+                                limit: int = Query(TASKS_SEARCH_LIMIT, ge=1, le=TASKS_PAGE_MAX),
+                                cursor: Optional[str] = None,
+                                user: str = Depends(verify_token)):
+    """
+    Busca en el título y la descripción de las tareas del usuario, con la
+    sintaxis de los buscadores web ("frase exacta", OR, -palabra). Los
+    resultados van de más a menos relevantes; si hay más, la cabecera
+    X-Next-Cursor trae el valor de `cursor` para pedir la página siguiente
+    """
+    after = parse_search_cursor(cursor) if cursor else None
+    version = await get_task_version(user)
+    tasks = await search_tasks(user, q, limit, after, version)
+    headers = {}
+    if len(tasks) == limit:
+        last = tasks[-1]
+        headers["X-Next-Cursor"] = f"{last['rank']!r}:{last['id']}"
+    return FastJSONResponse(tasks, headers=headers)
+
+
+@app.get("/tasks/stream")
+async def stream_task_events_endpoint(user: str = Depends(verify_token)):
+    """
+    Server-Sent Events con los cambios de las tareas del usuario: un evento
+    `task` por escritura ({"op": ..., "ids": [...]}) y `resync` cuando el
+    cliente se quedó atrás y debe volver a pedir GET /tasks
+    """
+    subscription = task_events.subscribe(user)
+    return StreamingResponse(task_events.sse(subscription),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
 
 
 @app.post("/tasks")
-def new_task_endpoint(task: Task, username: str = Depends(verify_token)):
-    add_task(username=username, title=task.title, description=task.description)
+async def new_task_endpoint(task: Task, username: str = Depends(verify_token)):
+    await add_task(username=username, title=task.title, description=task.description)
     return {"message": "Tarea registrada"}
 
 
+@app.post("/tasks:batch")
+async def new_tasks_batch_endpoint(batch: TaskBatch, username: str = Depends(verify_token)):
+    results = await add_tasks(username, [task.model_dump() for task in batch.tasks])
+    return {"results": results}
+
+
+@app.put("/tasks:batch")
+async def update_tasks_batch_endpoint(batch: TaskUpdateBatch,
+                                      user: str = Depends(verify_token)):
+    results = await update_tasks(user, [task.model_dump() for task in batch.tasks])
+    return {"results": results}
+
+
+@app.delete("/tasks:batch")
+async def remove_tasks_batch_endpoint(batch: TaskIdBatch,
+                                      user: str = Depends(verify_token)):
+    results = await remove_tasks(user, batch.ids)
+    return {"results": results}
+
+
 @app.put("/tasks/{task_id}")
-def update_task_endpoint(task_id: int, task: Task,
-                         user: str = Depends(verify_token)):
+async def update_task_endpoint(task_id: int, task: Task,
+                               user: str = Depends(verify_token)):
 
-    update_task(task_id, task.title, task.description)
+    await update_task(task_id, task.title, task.description)
     return {"message": "Tarea actualizada"}
 
 
 @app.delete("/tasks/{task_id}")
-def remove_task_endpoint(task_id: int, user: str = Depends(verify_token)):
-    remove_task(task_id)
+async def remove_task_endpoint(task_id: int, user: str = Depends(verify_token)):
+    await remove_task(task_id)
     return {"message": "Tarea eliminada"}
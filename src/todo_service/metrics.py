@@ -0,0 +1,115 @@
+import re
+import time
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Gauge,
+                               GCCollector, Histogram, PlatformCollector,
+                               ProcessCollector, generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import Response
+
+# Registro propio del módulo (en lugar del global de prometheus_client) para
+# poder importar el módulo más de una vez, p. ej. en los tests
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+PlatformCollector(registry=REGISTRY)
+GCCollector(registry=REGISTRY)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta y código de estado",
+    ["method", "route", "status"],
+    registry=REGISTRY
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Peticiones HTTP en curso",
+    registry=REGISTRY
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Tiempo de ejecución de cada sentencia SQL",
+    ["statement"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+    registry=REGISTRY
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_label(query: str) -> str:
+    """
+    Etiqueta acotada para una sentencia: el SQL sin saltos de línea ni
+    espacios repetidos. Las consultas son plantillas fijas, así que el
+    número de etiquetas distintas no crece con los datos
+    """
+    return _WHITESPACE.sub(" ", query).strip()[:120]
+
+
+def observe_query(query: str, started: float):
+    DB_QUERY_LATENCY.labels(statement_label(query)).observe(
+        time.perf_counter() - started)
+
+
+class StatsCollector:
+    """
+    Expone como gauges los valores numéricos de un diccionario de métricas
+    (p. ej. db.pool_stats), leído en cada scrape
+    """
+
+    def __init__(self, prefix, stats):
+        self.prefix = prefix
+        self.stats = stats
+
+    def collect(self):
+        try:
+            values = self.stats()
+        except Exception:
+            return
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            yield GaugeMetricFamily(f"{self.prefix}_{key}",
+                                    f"{self.prefix}: {key}", value=value)
+
+
+def register_stats(prefix, stats):
+    REGISTRY.register(StatsCollector(prefix, stats))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP. La ruta se etiqueta con la
+    plantilla (/tasks/{task_id}), no con la URL concreta
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def metrics_endpoint(request):
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,79 @@
+# Migraciones versionadas del esquema de todo_service. Cada una se aplica una
+# sola vez y queda registrada en `schema_migrations`, tabla compartida con
+# auth_service (la columna `service` separa las de cada servicio). Todas deben
+# ser idempotentes: también se aplican sobre bases creadas por el antiguo
+# init_db.
+
+SERVICE = "todo_service"
+
+# Clave del advisory lock que serializa las migraciones de todas las réplicas
+# y de ambos servicios, que comparten la misma base de datos
+LOCK_ID = 727001
+
+MIGRATIONS = [
+    (1, "crear tabla task", """
+        CREATE TABLE IF NOT EXISTS task (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            username TEXT NOT NULL
+        );
+    """),
+    (2, "titulo único por usuario en lugar de global", """
+        ALTER TABLE task DROP CONSTRAINT IF EXISTS task_title_key;
+        CREATE UNIQUE INDEX IF NOT EXISTS task_username_title_key
+            ON task (username, title);
+    """),
+    (3, "índice (username, id) para listar las tareas de un usuario", """
+        CREATE INDEX IF NOT EXISTS task_username_id_idx ON task (username, id);
+    """),
+    (4, "búsqueda de texto completo sobre título y descripción", """
+        ALTER TABLE task ADD COLUMN IF NOT EXISTS search tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('spanish', title), 'A') ||
+                setweight(to_tsvector('spanish', description), 'B')
+            ) STORED;
+        CREATE INDEX IF NOT EXISTS task_search_idx ON task USING GIN (search);
+    """),
+    (5, "versión por usuario de sus tareas (ETag y cache)", """
+        CREATE TABLE IF NOT EXISTS task_versions (
+            username TEXT PRIMARY KEY,
+            version BIGINT NOT NULL
+        );
+    """),
+]
+
+
+async def migrate(database):
+    """
+    Aplica en una única transacción las migraciones pendientes y devuelve
+    las versiones aplicadas. Si una falla, no se aplica ninguna
+    """
+    applied_now = []
+    async with database.transaction() as tx:
+        await tx.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_ID,))
+        await tx.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                service TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (service, version)
+            );
+        """)
+        rows = await tx.fetch_all(
+            "SELECT version FROM schema_migrations WHERE service = %s", (SERVICE,))
+        applied = {row["version"] for row in rows}
+
+        for version, description, sql in MIGRATIONS:
+            if version in applied:
+                continue
+            await tx.execute(sql)
+            await tx.execute(
+                "INSERT INTO schema_migrations (service, version, description) VALUES (%s, %s, %s)",
+                (SERVICE, version, description)
+            )
+            applied_now.append(version)
+            print(f"Migración {version} aplicada: {description}")
+
+    return applied_now
@@ -0,0 +1,14 @@
+import orjson
+from starlette.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse que codifica con orjson. Las rutas calientes la devuelven
+    ya construida para que FastAPI no pase cada fila por jsonable_encoder;
+    orjson escribe directamente los bytes UTF-8 de dicts, listas, fechas y
+    UUID sin el codificador estándar
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,50 @@
+import math
+import os
+from os import getenv
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PORT = int(getenv("PORT", "8002"))
+# Número de procesos uvicorn; "auto" = una por CPU disponible para el contenedor
+WEB_CONCURRENCY = getenv("WEB_CONCURRENCY", "1")
+
+
+def available_cpus():
+    """
+    CPUs que puede usar el proceso: respeta la afinidad y el límite de CPU
+    del cgroup (resources.limits.cpu en Kubernetes), que os.cpu_count ignora
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count():
+    if WEB_CONCURRENCY == "auto":
+        return available_cpus()
+    return max(1, int(WEB_CONCURRENCY))
+
+
+def check_task_cache(workers):
+    """
+    La cache en memoria es de cada proceso: con varios workers cada uno
+    guarda su propia copia de cada lista y los aciertos se reparten entre
+    ellos. En ese caso no se arranca y se pide redis o none
+    """
+    if workers > 1 and getenv("TASK_CACHE_BACKEND") == "memory":
+        raise SystemExit(
+            f"TASK_CACHE_BACKEND=memory no admite {workers} workers: usar redis o none")
+
+
+if __name__ == "__main__":
+    workers = worker_count()
+    check_task_cache(workers)
+    uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=workers)
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("passlib")
+pytest.importorskip("jwt")
+
+
+@pytest.fixture
+def business_logic():
+    return load_service_module("auth_service", "business_logic")
+
+
+def test_hashing_pool_rejects_when_queue_is_full(business_logic):
+    pool = business_logic.HashingPool(workers=1, max_queue=1)
+    release = threading.Event()
+    running = pool.submit(release.wait)
+    queued = pool.submit(release.wait)
+
+    with pytest.raises(business_logic.HashingOverloaded):
+        pool.submit(release.wait)
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["queued"] == 1
+
+    release.set()
+    running.result()
+    queued.result()
+    assert asyncio.run(pool.run(lambda: "ok")) == "ok"
+
+
+def test_hash_and_verify_password(business_logic):
+    async def scenario():
+        hashed = await business_logic.hash_password("secreto")
+        return (await business_logic.verify_password("secreto", hashed),
+                await business_logic.verify_password("otro", hashed))
+
+    assert asyncio.run(scenario()) == (True, False)
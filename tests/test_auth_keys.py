@@ -0,0 +1,41 @@
+import pytest
+from conftest import load_service_module
+
+jwt = pytest.importorskip("jwt")
+serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    monkeypatch.delenv("JWT_KEYS_DIR", raising=False)
+    monkeypatch.setenv("ALGORITHM", "EdDSA")
+    return load_service_module("auth_service", "keys")
+
+
+def write_key(keys, path, algorithm):
+    pem = keys.generate_key(algorithm).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption())
+    path.write_bytes(pem)
+
+
+def test_key_directory_rotation_without_restart(keys, tmp_path):
+    write_key(keys, tmp_path / "2024-01.pem", "RS256")
+    store = keys.KeyStore(str(tmp_path), reload_interval=0)
+    kid, private_key, algorithm = store.signing_key()
+    assert (kid, algorithm) == ("2024-01", "RS256")
+    old_token = jwt.encode({"u": 1}, private_key, algorithm=algorithm, headers={"kid": kid})
+
+    write_key(keys, tmp_path / "2024-02.pem", "EdDSA")
+    assert store.signing_key()[0] == "2024-02"
+    assert [k["kid"] for k in store.jwks()["keys"]] == ["2024-01", "2024-02"]
+
+    # Los tokens firmados con la clave anterior siguen verificándose con el JWKS
+    jwk = jwt.PyJWK(store.jwks()["keys"][0])
+    assert jwt.decode(old_token, jwk.key, algorithms=[jwk.algorithm_name]) == {"u": 1}
+
+
+def test_jwks_never_exposes_private_material(keys):
+    store = keys.KeyStore(algorithm="RS256")
+    (jwk,) = store.jwks()["keys"]
+    assert jwk["kty"] == "RSA" and not {"d", "p", "q"} & set(jwk)
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("passlib")
+pytest.importorskip("jwt")
+
+
+class FakeDatabase:
+    """
+    Emula la tabla revoked_tokens: el INSERT ... ON CONFLICT solo devuelve
+    fila la primera vez que se inserta un id, y la consulta por ids
+    devuelve los que ya están
+    """
+
+    def __init__(self):
+        self.revoked = {}
+        self.lookups = 0
+
+    async def fetch_one(self, query, params=None):
+        token_id, expires_at = params
+        if token_id in self.revoked:
+            return None
+        self.revoked[token_id] = expires_at
+        return {"jti": token_id}
+
+    async def fetch_all(self, query, params=None):
+        self.lookups += 1
+        return [{"jti": token_id, "exp": self.revoked[token_id]}
+                for token_id in params[0] if token_id in self.revoked]
+
+
+@pytest.fixture
+def business_logic(monkeypatch):
+    monkeypatch.delenv("JWT_KEYS_DIR", raising=False)
+    monkeypatch.setenv("ALGORITHM", "EdDSA")
+    return load_service_module("auth_service", "business_logic")
+
+
+def test_refresh_rotates_and_detects_reuse(business_logic):
+    database = FakeDatabase()
+    tokens = business_logic.issue_tokens("ana")
+
+    rotated = asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+    assert business_logic.verify_token(rotated["token"])["username"] == "ana"
+
+    # Reutilizar un refresh token ya rotado revoca toda la familia
+    with pytest.raises(business_logic.RefreshTokenError, match="reused"):
+        asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+    with pytest.raises(business_logic.RefreshTokenError, match="revoked"):
+        asyncio.run(business_logic.rotate_refresh_token(database, rotated["refresh_token"]))
+
+
+def test_reuse_is_detected_by_the_database_on_other_replicas(business_logic):
+    database = FakeDatabase()
+    tokens = business_logic.issue_tokens("ana")
+    asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+
+    # Otra réplica, con su conjunto en memoria vacío
+    business_logic.revocation_list = business_logic.RevocationList()
+    with pytest.raises(business_logic.RefreshTokenError, match="reused"):
+        asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+
+
+def test_family_revoked_on_another_worker_is_rejected(business_logic):
+    database = FakeDatabase()
+    tokens = business_logic.issue_tokens("ana")
+    asyncio.run(business_logic.revoke_refresh_token(database, tokens["refresh_token"]))
+
+    # Otro worker, que no vio el logout
+    business_logic.revocation_list = business_logic.RevocationList()
+    with pytest.raises(business_logic.RefreshTokenError, match="revoked"):
+        asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+
+    # El positivo queda en memoria: el siguiente rechazo no consulta la tabla
+    lookups = database.lookups
+    with pytest.raises(business_logic.RefreshTokenError, match="revoked"):
+        asyncio.run(business_logic.rotate_refresh_token(database, tokens["refresh_token"]))
+    assert database.lookups == lookups
+
+
+def test_access_token_is_not_a_refresh_token(business_logic):
+    tokens = business_logic.issue_tokens("ana")
+    with pytest.raises(business_logic.RefreshTokenError):
+        asyncio.run(business_logic.rotate_refresh_token(FakeDatabase(), tokens["token"]))
@@ -0,0 +1,142 @@
+import asyncio
+import statistics
+import sys
+import time
+import pytest
+from conftest import benchmark, load_service_module, requires_db
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("passlib")
+
+pytestmark = requires_db
+
+
+@pytest.fixture
+def service(schema, monkeypatch):
+    monkeypatch.setenv("BCRYPT_ROUNDS", "4")
+    main = load_service_module("auth_service", "main")
+    routes = sys.modules["routes"]
+    hashes = []
+    original = routes.hash_password
+
+    async def counting_hash(password):
+        hashes.append(password)
+        return await original(password)
+
+    monkeypatch.setattr(routes, "hash_password", counting_hash)
+    return main, schema, hashes
+
+
+def run(main, scenario):
+    async def wrapper():
+        await main.startup()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+                return await scenario(client)
+        finally:
+            await main.shutdown()
+    return asyncio.run(wrapper())
+
+
+def register(client, username, email):
+    return client.post("/auth/register", data={
+        "username": username, "email": email, "password": "secret"})
+
+
+def test_concurrent_burst_creates_a_single_user(service):
+    main, schema, _ = service
+
+    async def burst(client):
+        return await asyncio.gather(*(
+            register(client, "ana", f"ana{i}@example.com") for i in range(20)))
+
+    responses = run(main, burst)
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [201] + [400] * 19
+    assert {r.json()["detail"] for r in responses if r.status_code == 400} == {
+        "Username already exists"}
+    assert schema("SELECT count(*) FROM users WHERE username = 'ana'") == [(1,)]
+
+
+def test_conflicts_are_reported_before_hashing(service):
+    main, _, hashes = service
+
+    async def scenario(client):
+        first = await register(client, "ana", "ana@example.com")
+        same_user = await register(client, "ana", "otra@example.com")
+        same_email = await register(client, "bob", "ana@example.com")
+        return first, same_user, same_email
+
+    first, same_user, same_email = run(main, scenario)
+    assert first.status_code == 201
+    assert (same_user.status_code, same_user.json()["detail"]) == (400, "Username already exists")
+    assert (same_email.status_code, same_email.json()["detail"]) == (400, "Email already exists")
+    # Solo el registro que se creó pagó el coste de bcrypt
+    assert len(hashes) == 1
+
+
+class LaggingReader:
+    """
+    Réplica que todavía no ha recibido ningún usuario
+    """
+
+    async def fetch_one(self, query, params=None):
+        return None
+
+
+def test_login_right_after_register_survives_a_lagging_replica(service):
+    main, _, _ = service
+    routes = sys.modules["routes"]
+    main.app.dependency_overrides[routes.get_reader] = LaggingReader
+
+    async def scenario(client):
+        await register(client, "ana", "ana@example.com")
+        return (await client.post("/auth/login", data={"username": "ana", "password": "secret"}),
+                await client.post("/auth/login", data={"username": "ana", "password": "otra"}))
+
+    try:
+        ok, wrong = run(main, scenario)
+    finally:
+        main.app.dependency_overrides.clear()
+    assert ok.status_code == 200 and "token" in ok.json()
+    assert wrong.status_code == 401
+
+
+@benchmark
+def test_burst_p99_improves_when_conflicts_skip_bcrypt(schema, monkeypatch):
+    monkeypatch.setenv("BCRYPT_ROUNDS", "10")
+    monkeypatch.setenv("HASH_WORKERS", "2")
+    monkeypatch.setenv("HASH_QUEUE_SIZE", "1000")
+    main = load_service_module("auth_service", "main")
+    routes = sys.modules["routes"]
+
+    async def hash_first(database, username, email):
+        # Camino anterior: sin comprobación previa, todo registro paga bcrypt
+        return None
+
+    def burst(round_):
+        async def timed(client, username):
+            started = time.perf_counter()
+            response = await register(client, username, f"{username}@example.com")
+            return response.status_code, time.perf_counter() - started
+
+        async def scenario(client):
+            # 30 reintentos de usuarios que ya existen y 10 registros nuevos
+            schema("DELETE FROM users")
+            schema("INSERT INTO users (username, email, password) "
+                   "SELECT 'user' || i, 'user' || i || '@example.com', 'x' "
+                   "FROM generate_series(1, 30) AS i")
+            names = [f"user{i}" for i in range(1, 31)] + [f"{round_}{i}" for i in range(10)]
+            return await asyncio.gather(*(timed(client, name) for name in names))
+
+        results = run(main, scenario)
+        assert sorted(code for code, _ in results) == [201] * 10 + [400] * 30
+        return statistics.quantiles([t for _, t in results], n=100)[98]
+
+    with monkeypatch.context() as patched:
+        patched.setattr(routes, "registration_conflict", hash_first)
+        before = burst("before")
+    after = burst("after")
+    print(f"p99 antes {before * 1000:.0f} ms, después {after * 1000:.0f} ms")
+    assert after < before
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import sys
+import pytest
+from conftest import load_service_module, requires_db
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("passlib")
+
+pytestmark = requires_db
+
+USERNAMES = ["ana", "bob", "eva", "leo", "sol"]
+
+
+@pytest.fixture
+def service(schema, monkeypatch):
+    monkeypatch.setenv("USERS_STREAM_BATCH", "2")
+    main = load_service_module("auth_service", "main")
+    return main, schema
+
+
+def run(main, schema, scenario):
+    async def wrapper():
+        await main.startup()
+        try:
+            schema("INSERT INTO users (username, email, password) VALUES " + ", ".join(
+                f"('{name}', '{name}@example.com', 'x')" for name in USERNAMES))
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+                return await scenario(client)
+        finally:
+            await main.shutdown()
+    return asyncio.run(wrapper())
+
+
+def test_pages_follow_next_after(service):
+    main, schema = service
+
+    async def scenario(client):
+        pages, params = [], {"limit": 2}
+        while True:
+            body = (await client.get("/auth/users", params=params)).json()
+            pages.append([user["username"] for user in body["users"]])
+            if body["next_after"] is None:
+                return pages
+            params = {"limit": 2, "after": body["next_after"]}
+
+    assert run(main, schema, scenario) == [["ana", "bob"], ["eva", "leo"], ["sol"]]
+
+
+def test_full_list_is_streamed_as_json_and_ndjson(service):
+    main, schema = service
+
+    async def scenario(client):
+        return (await client.get("/auth/users"),
+                await client.get("/auth/users", params={"format": "ndjson", "after": "bob"}),
+                await client.get("/auth/users", params={"after": "sol"}))
+
+    as_json, as_ndjson, empty = run(main, schema, scenario)
+    assert as_json.headers["content-type"] == "application/json"
+    assert as_json.json() == {"users": [
+        {"username": name, "email": f"{name}@example.com"} for name in USERNAMES]}
+    assert as_ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["username"] for line in as_ndjson.text.splitlines()] == [
+        "eva", "leo", "sol"]
+    assert empty.json() == {"users": []}
+
+
+class FailingReader:
+    def __init__(self, error):
+        self.error = error
+
+    async def stream(self, query, params=None, batch_size=500, fresh=None):
+        raise self.error
+        yield
+
+
+@pytest.mark.parametrize("error, status", [("PoolTimeout", 503), ("DatabaseError", 500)])
+def test_stream_errors_before_the_first_batch_get_a_status(service, error, status):
+    main, schema = service
+    routes, db = sys.modules["routes"], sys.modules["db"]
+    reader = FailingReader(getattr(db, error)("no connection"))
+    main.app.dependency_overrides[routes.get_reader] = lambda: reader
+
+    async def scenario(client):
+        return await client.get("/auth/users")
+
+    try:
+        assert run(main, schema, scenario).status_code == status
+    finally:
+        main.app.dependency_overrides.clear()
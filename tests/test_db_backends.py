@@ -0,0 +1,169 @@
+import asyncio
+import pytest
+from conftest import load_service_module
+
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("starlette")
+from psycopg2.extensions import (  # noqa: E402
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS)
+
+SERVICES = ["auth_service", "todo_service"]
+
+
+class Column:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeCursor:
+    """
+    Devuelve siempre una fila (1, 'ana'); una consulta con 'duplicado'
+    falla como un INSERT que viola un índice único
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+        self.conn.status = TRANSACTION_STATUS_INTRANS
+        if "duplicado" in query:
+            raise psycopg2.errors.UniqueViolation("duplicate key value")
+        self.description = [Column("id"), Column("username")]
+        self.rowcount = 1
+
+    def fetchall(self):
+        return [(1, "ana")]
+
+    def fetchone(self):
+        return (1, "ana")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = TRANSACTION_STATUS_IDLE
+        self.queries = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(params=SERVICES)
+def db(request, monkeypatch):
+    module = load_service_module(request.param, "db")
+    created = []
+
+    def connect(host=None, port=None):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    monkeypatch.setattr(module, "_connect", connect)
+    monkeypatch.setattr(module, "POOL_MIN_SIZE", 0)
+    monkeypatch.setattr(module, "POOL_MAX_SIZE", 1)
+    monkeypatch.setattr(module, "POOL_TIMEOUT", 0.05)
+    module.created = created
+    return module
+
+
+def test_sync_queries_share_one_pooled_connection(db):
+    database = db.SyncDatabase()
+
+    async def scenario():
+        return (await database.fetch_one("SELECT id, username FROM users"),
+                await database.fetch_all("SELECT id, username FROM users"),
+                await database.execute("UPDATE users SET email = email"))
+
+    one, rows, affected = asyncio.run(scenario())
+    assert one == {"id": 1, "username": "ana"}
+    assert rows == [{"id": 1, "username": "ana"}] and affected == 1
+    (conn,) = db.created
+    assert conn.commits == 3
+    stats = database.stats()
+    assert stats["checkouts"] == 3 and stats["in_use"] == 0 and stats["backend"] == "sync"
+
+
+def test_sync_errors_are_translated_and_connection_returned(db):
+    database = db.SyncDatabase()
+    with pytest.raises(db.UniqueViolation):
+        asyncio.run(database.execute("INSERT duplicado"))
+
+    (conn,) = db.created
+    assert conn.rollbacks == 1 and not conn.closed
+    assert database.stats()["in_use"] == 0
+
+
+def test_transaction_commits_once_or_rolls_back(db):
+    database = db.SyncDatabase()
+
+    async def committed():
+        async with database.transaction() as tx:
+            await tx.execute("UPDATE users SET email = email")
+            await tx.execute("UPDATE users SET email = email")
+
+    async def failed():
+        async with database.transaction() as tx:
+            await tx.execute("UPDATE users SET email = email")
+            await tx.execute("INSERT duplicado")
+
+    asyncio.run(committed())
+    (conn,) = db.created
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+    with pytest.raises(db.UniqueViolation):
+        asyncio.run(failed())
+    assert (conn.commits, conn.rollbacks) == (1, 1)
+
+
+def test_saturated_pool_raises_pool_timeout(db):
+    database = db.SyncDatabase()
+
+    async def scenario():
+        async with database.transaction():
+            await database.execute("SELECT 1")
+
+    with pytest.raises(db.PoolTimeout):
+        asyncio.run(scenario())
+    assert database.stats()["timeouts"] == 1
+
+
+@pytest.mark.parametrize("service", SERVICES)
+def test_backend_is_selected_by_db_backend(service, monkeypatch):
+    db = load_service_module(service, "db")
+    monkeypatch.setattr(db, "DB_BACKEND", "sync")
+    assert isinstance(db._create_backend(), db.SyncDatabase)
+
+    monkeypatch.setattr(db, "DB_BACKEND", "otro")
+    with pytest.raises(ValueError):
+        db._create_backend()
+
+    pytest.importorskip("psycopg_pool")
+    monkeypatch.setattr(db, "DB_BACKEND", "async")
+    database = db._create_backend()
+    assert isinstance(database, db.AsyncDatabase)
+    assert database.stats()["backend"] == "async"
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("psycopg2")
+
+VERSION_QUERY = "SELECT version FROM task_versions WHERE username = %s"
+
+
+class FakeBackend:
+    """
+    Backend que responde con su propio nombre y puede simular una caída
+    """
+
+    def __init__(self, db, host):
+        self.db = db
+        self.host = host
+        self.down = False
+        self.calls = 0
+        self.version = 0
+
+    async def fetch_all(self, query, params=None):
+        self.calls += 1
+        if self.down:
+            raise self.db.ConnectionFailed("connection refused")
+        if query == VERSION_QUERY:
+            return [{"version": self.version}]
+        return [{"host": self.host}]
+
+    async def fetch_one(self, query, params=None):
+        return (await self.fetch_all(query, params))[0]
+
+    async def stream(self, query, params=None, batch_size=500):
+        self.calls += 1
+        if self.down:
+            raise self.db.ConnectionFailed("connection refused")
+        yield [{"host": self.host}]
+        yield [{"host": self.host}]
+
+
+@pytest.fixture
+def db():
+    return load_service_module("todo_service", "db")
+
+
+def make_router(db, replicas=2, **kwargs):
+    primary = FakeBackend(db, "primary")
+    backends = [FakeBackend(db, f"replica{i}") for i in range(replicas)]
+    return db.ReplicaRouter(primary, backends, **kwargs), primary, backends
+
+
+def read_host(router, fresh=None):
+    return asyncio.run(router.fetch_one("SELECT 1", fresh=fresh))["host"]
+
+
+def at_least(version):
+    return VERSION_QUERY, ("ana",), version
+
+
+def test_reads_round_robin_over_replicas(db):
+    router, _, _ = make_router(db)
+    assert [read_host(router) for _ in range(4)] == [
+        "replica0", "replica1", "replica0", "replica1"]
+    assert router.stats()["replica_reads"] == 4
+
+
+def test_without_replicas_reads_go_to_primary(db):
+    router, _, _ = make_router(db, replicas=0)
+    assert read_host(router, at_least(1)) == "primary"
+    assert router.stats()["primary_reads"] == 1
+
+
+def test_failed_replica_is_ejected_and_query_retried_on_primary(db):
+    router, primary, (broken, healthy) = make_router(db, eject_seconds=60)
+    broken.down = True
+
+    assert read_host(router) == "primary"
+    assert [read_host(router) for _ in range(3)] == ["replica1"] * 3
+    assert broken.calls == 1
+    stats = router.stats()
+    assert stats["ejections"] == 1 and stats["fallbacks"] == 1
+    assert stats["healthy_replicas"] == 1
+
+
+def test_ejected_replica_returns_after_timeout(db):
+    router, _, (broken,) = make_router(db, replicas=1, eject_seconds=0)
+    broken.down = True
+    assert read_host(router) == "primary"
+    broken.down = False
+    assert read_host(router) == "replica0"
+
+
+def test_lagging_replica_sends_the_read_to_primary(db):
+    router, _, (behind, ahead) = make_router(db)
+    behind.version, ahead.version = 1, 2
+
+    assert read_host(router, at_least(2)) == "primary"
+    assert read_host(router, at_least(2)) == "replica1"
+    assert read_host(router, at_least(1)) == "replica0"
+    stats = router.stats()
+    assert stats["lagging_reads"] == 1 and stats["replica_reads"] == 2
+
+
+def test_replica_without_the_row_counts_as_version_zero(db):
+    router, _, (replica,) = make_router(db, replicas=1)
+    replica.version = None
+    assert read_host(router, at_least(0)) == "replica0"
+    assert read_host(router, at_least(1)) == "primary"
+
+
+def test_stream_checks_freshness_before_streaming(db):
+    router, _, (replica,) = make_router(db, replicas=1)
+
+    async def collect(fresh):
+        return [rows[0]["host"] async for rows in router.stream("SELECT 1", fresh=fresh)]
+
+    assert asyncio.run(collect(at_least(1))) == ["primary", "primary"]
+    replica.version = 1
+    assert asyncio.run(collect(at_least(1))) == ["replica0", "replica0"]
+
+
+def test_stream_falls_back_before_first_batch(db):
+    router, _, (broken,) = make_router(db, replicas=1)
+    broken.down = True
+
+    async def collect():
+        return [rows async for rows in router.stream("SELECT 1")]
+
+    batches = asyncio.run(collect())
+    assert [rows[0]["host"] for rows in batches] == ["primary", "primary"]
+    assert router.stats()["ejections"] == 1
@@ -0,0 +1,26 @@
+import datetime
+import uuid
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("orjson")
+
+
+@pytest.mark.parametrize("service", ["todo_service", "auth_service"])
+def test_row_mapper_builds_dicts_and_is_reused(service):
+    db = load_service_module(service, "db")
+    mapper = db.row_mapper(("id", "title", "it's"))
+    assert mapper((1, "a", None)) == {"id": 1, "title": "a", "it's": None}
+    assert db.row_mapper(("id", "title", "it's")) is mapper
+
+
+@pytest.mark.parametrize("service", ["todo_service", "auth_service"])
+def test_fast_json_response_matches_json(service):
+    responses = load_service_module(service, "responses")
+    token = uuid.uuid4()
+    response = responses.FastJSONResponse(
+        [{"title": "café", "at": datetime.datetime(2024, 1, 2, 3, 4, 5), "jti": token}])
+    assert response.body == (
+        '[{"title":"café","at":"2024-01-02T03:04:05","jti":"%s"}]' % token).encode()
+    assert response.media_type == "application/json"
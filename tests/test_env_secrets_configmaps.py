@@ -0,0 +1,80 @@
+import json
+import os
+import stat
+import sys
+import pytest
+from conftest import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
+import env_secrets_configmaps as generator  # noqa: E402
+sys.path.remove(SRC_DIR)
+
+FAKE_KUBECTL = """#!{python}
+import json, sys
+with open({log!r}, "a") as f:
+    f.write(json.dumps({{"args": sys.argv[1:], "stdin": sys.stdin.read()}}) + "\\n")
+"""
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    log = tmp_path / "kubectl.log"
+    kubectl = tmp_path / "kubectl"
+    kubectl.write_text(FAKE_KUBECTL.format(python=sys.executable, log=str(log)))
+    kubectl.chmod(kubectl.stat().st_mode | stat.S_IEXEC)
+
+    services = {}
+    for name, content in {"a-env": "HOST=a\nSECRET_PASS=1\n",
+                          "b-env": "HOST=b\n"}.items():
+        service_dir = tmp_path / name
+        service_dir.mkdir()
+        (service_dir / ".env").write_text(content)
+        services[name] = str(service_dir)
+
+    monkeypatch.setattr(generator, "SERVICES", services)
+    monkeypatch.setattr(generator, "KUBECTL", str(kubectl))
+    monkeypatch.setattr(generator, "APPLIED_CACHE", str(tmp_path / "cache.json"))
+
+    def calls():
+        if not log.exists():
+            return []
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+    return tmp_path, calls
+
+
+def applied_names(call):
+    return [item["metadata"]["name"] for item in json.loads(call["stdin"])["items"]]
+
+
+def test_all_applies_every_manifest_in_one_server_side_call(env):
+    _, calls = env
+    generator.apply_all()
+
+    (call,) = calls()
+    assert call["args"][:2] == ["apply", "--server-side"] and call["args"][-2:] == ["-f", "-"]
+    assert applied_names(call) == ["a-env-config", "a-env-secret",
+                                   "b-env-config", "b-env-secret"]
+    secret = json.loads(call["stdin"])["items"][1]
+    assert secret["data"] == {"SECRET_PASS": "MQ=="}
+
+
+def test_only_changed_manifests_are_reapplied(env):
+    tmp_path, calls = env
+    generator.apply_all()
+    assert generator.apply_all() == []
+    assert len(calls()) == 1
+
+    (tmp_path / "b-env" / ".env").write_text("HOST=otro\n")
+    assert generator.apply_all() == ["ConfigMap/b-env-config"]
+    assert applied_names(calls()[-1]) == ["b-env-config"]
+
+    assert len(generator.apply_all(force=True)) == 4
+
+
+def test_failed_apply_does_not_update_the_cache(env, monkeypatch):
+    tmp_path, _ = env
+    monkeypatch.setattr(generator, "KUBECTL", "false")
+    with pytest.raises(generator.subprocess.CalledProcessError):
+        generator.apply_all()
+    assert not os.path.exists(tmp_path / "cache.json")
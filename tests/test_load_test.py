@@ -0,0 +1,33 @@
+import sys
+from conftest import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
+import load_test  # noqa: E402
+sys.path.remove(SRC_DIR)
+
+
+def test_summarize_reports_nearest_rank_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)]
+    summary = load_test.summarize(latencies, errors=2, elapsed=2.0)
+    assert summary == {"requests": 100, "errors": 2, "rps": 50.0,
+                       "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"task_crud": {"requests": 10, "errors": 0, "rps": 100.0,
+                              "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0}}
+    within = {"task_crud": {"requests": 10, "errors": 0, "rps": 85.0,
+                            "p50_ms": 11.9, "p95_ms": 23.0, "p99_ms": 30.0}}
+    assert load_test.compare(within, baseline, 0.2) == []
+
+    worse = {"task_crud": {"requests": 10, "errors": 1, "rps": 70.0,
+                           "p50_ms": 10.0, "p95_ms": 30.0, "p99_ms": 30.0}}
+    regressions = load_test.compare(worse, baseline, 0.2)
+    assert [r.split(":")[0] for r in regressions] == [
+        "task_crud.p95_ms", "task_crud.rps", "task_crud.errors"]
+
+
+def test_compare_ignores_scenarios_missing_from_baseline():
+    current = {"large_list": {"requests": 1, "errors": 5, "rps": 1.0,
+                              "p50_ms": 1.0, "p95_ms": 1.0, "p99_ms": 1.0}}
+    assert load_test.compare(current, {}, 0.2) == []
@@ -0,0 +1,49 @@
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("prometheus_client")
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(params=["auth_service", "todo_service"])
+def metrics(request):
+    return load_service_module(request.param, "metrics")
+
+
+def sample(metrics, name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels)
+
+
+def test_middleware_labels_requests_by_route_template(metrics):
+    app = fastapi.FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_route("/metrics", metrics.metrics_endpoint)
+
+    @app.get("/tasks/{task_id}")
+    def read_task(task_id: int):
+        return {"id": task_id}
+
+    with TestClient(app) as client:
+        client.get("/tasks/1")
+        client.get("/tasks/2")
+        client.get("/nope")
+        body = client.get("/metrics").text
+
+    assert sample(metrics, "http_request_duration_seconds_count",
+                  method="GET", route="/tasks/{task_id}", status="200") == 2
+    assert sample(metrics, "http_request_duration_seconds_count",
+                  method="GET", route="unmatched", status="404") == 1
+    assert "http_requests_in_flight" in body
+
+
+def test_stats_collector_exports_numeric_values(metrics):
+    metrics.register_stats("db_pool", lambda: {
+        "in_use": 3, "saturation": 0.3, "backend": "sync"})
+    assert sample(metrics, "db_pool_in_use") == 3
+    assert sample(metrics, "db_pool_saturation") == 0.3
+    assert sample(metrics, "db_pool_backend") is None
+
+
+def test_statement_label_is_normalized(metrics):
+    assert metrics.statement_label("SELECT id\n    FROM Task\n") == "SELECT id FROM Task"
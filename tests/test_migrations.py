@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from conftest import load_service_module, requires_db
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+pytestmark = requires_db
+
+LEGACY_TASK = """
+    CREATE TABLE task (
+    id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL,
+    username TEXT NOT NULL
+    );
+"""
+
+LEGACY_USERS = """
+    CREATE TABLE users (
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    );
+"""
+
+
+def migrate(service):
+    db = load_service_module(service, "db")
+    migrations = load_service_module(service, "migrations")
+
+    async def run():
+        try:
+            return await migrations.migrate(db.get_database())
+        finally:
+            await db.close_database()
+
+    return asyncio.run(run()), migrations
+
+
+@pytest.mark.parametrize("service", ["todo_service", "auth_service"])
+def test_migrations_are_idempotent(schema, service):
+    applied, migrations = migrate(service)
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+
+    applied_again, _ = migrate(service)
+    assert applied_again == []
+
+    # Cada migración debe poder re-ejecutarse sin error sobre su propio resultado
+    for _, _, sql in migrations.MIGRATIONS:
+        schema(sql)
+
+
+def test_todo_migrations_upgrade_legacy_schema(schema):
+    schema(LEGACY_TASK)
+    schema("INSERT INTO task (title, description, username) VALUES ('a', 'd', 'ana')")
+
+    migrate("todo_service")
+
+    # El título ahora es único por usuario, no global
+    schema("INSERT INTO task (title, description, username) VALUES ('a', 'd', 'bob')")
+    with pytest.raises(psycopg2.errors.UniqueViolation):
+        schema("INSERT INTO task (title, description, username) VALUES ('a', 'd', 'ana')")
+
+    indexes = {row[0] for row in schema(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'task'")}
+    assert "task_username_id_idx" in indexes
+
+
+def test_auth_migrations_add_primary_key_to_legacy_users(schema):
+    schema(LEGACY_USERS)
+    schema("INSERT INTO users (username, email, password) VALUES ('ana', 'a@x', 'h')")
+
+    migrate("auth_service")
+
+    rows = schema("""
+        SELECT a.attname FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = 'users'::regclass AND i.indisprimary
+    """)
+    assert rows == [("id",)]
+    assert schema("SELECT id FROM users WHERE username = 'ana'") == [(1,)]
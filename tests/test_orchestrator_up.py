@@ -0,0 +1,126 @@
+import json
+import subprocess
+import sys
+import threading
+import pytest
+from conftest import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
+import env_orchestrator  # noqa: E402
+sys.path.remove(SRC_DIR)
+
+
+def test_resolve_order_puts_dependencies_first():
+    assert env_orchestrator.resolve_order(["todo-env"]) == ["db-env", "todo-env"]
+    order = env_orchestrator.resolve_order(list(env_orchestrator.DEPENDENCIES))
+    assert order[0] == "db-env" and sorted(order[1:]) == ["auth-env", "todo-env"]
+
+
+def test_resolve_order_rejects_cycles(monkeypatch):
+    monkeypatch.setitem(env_orchestrator.DEPENDENCIES, "db-env", ["todo-env"])
+    with pytest.raises(ValueError):
+        env_orchestrator.resolve_order(["todo-env"])
+
+
+def test_independent_services_run_concurrently():
+    # auth y todo solo pueden terminar si ambos están en marcha a la vez
+    both_started = threading.Barrier(2, timeout=5)
+    started = []
+
+    def action(env_name):
+        started.append(env_name)
+        if env_name != "db-env":
+            both_started.wait()
+        return True, {"apply": 0.0, "ready": 0.0}
+
+    results = env_orchestrator.run_graph(["auth-env", "todo-env"], action)
+    assert started[0] == "db-env"
+    assert all(ok for ok, _ in results.values())
+
+
+def test_dependents_are_skipped_when_a_dependency_fails():
+    calls = []
+
+    def action(env_name):
+        calls.append(env_name)
+        return env_name != "db-env", {}
+
+    results = env_orchestrator.run_graph(["auth-env", "todo-env"], action)
+    assert calls == ["db-env"]
+    assert not any(ok for ok, _ in results.values())
+
+
+def test_applied_generation_reads_the_deployment_from_apply_output():
+    output = json.dumps({"kind": "List", "items": [
+        {"kind": "Service", "metadata": {"name": "db"}},
+        {"kind": "Deployment", "metadata": {"name": "db", "generation": 3}},
+    ]})
+    assert env_orchestrator.applied_generation(output, "db") == 3
+    assert env_orchestrator.applied_generation("error", "db") is None
+
+
+def test_fingerprint_ignores_bytecode_and_tracks_content(tmp_path):
+    (tmp_path / "main.py").write_text("print('a')")
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"x")
+    before = env_orchestrator.fingerprint(str(tmp_path))
+
+    (tmp_path / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"y")
+    assert env_orchestrator.fingerprint(str(tmp_path)) == before
+
+    (tmp_path / "main.py").write_text("print('b')")
+    assert env_orchestrator.fingerprint(str(tmp_path)) != before
+
+
+def test_fingerprint_cache_persists_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(env_orchestrator, "FINGERPRINT_CACHE", str(tmp_path / "cache.json"))
+    assert env_orchestrator.load_fingerprints() == {}
+    env_orchestrator.save_fingerprint("k8s", "auth-env", "abc")
+    env_orchestrator.save_fingerprint("compose", "auth-env", "def")
+    assert env_orchestrator.load_fingerprints() == {
+        "k8s": {"auth-env": "abc"}, "compose": {"auth-env": "def"}}
+
+
+def test_manifest_is_stamped_with_the_content_hash():
+    tag = env_orchestrator.image_tag("auth-env")
+    manifest = env_orchestrator.render_manifest("auth-env", tag)
+    assert f"image: {tag}" in manifest and ":latest" not in manifest
+
+
+class FakeWatch:
+    def __init__(self):
+        self.targets = []
+
+    def wait_for(self, targets, timeout):
+        self.targets.append(targets)
+        return True
+
+
+def test_unchanged_environment_is_not_rebuilt_nor_reapplied(tmp_path, monkeypatch):
+    monkeypatch.setattr(env_orchestrator, "FINGERPRINT_CACHE", str(tmp_path / "cache.json"))
+    commands = []
+    images = set()
+
+    def fake_run(command, **kwargs):
+        commands.append(command[:3])
+        if command[:3] == ["docker", "image", "inspect"]:
+            return subprocess.CompletedProcess(command, 0 if command[3] in images else 1)
+        if command[:2] == ["docker", "build"]:
+            images.add(command[3])
+        stdout = json.dumps({"kind": "Deployment",
+                             "metadata": {"name": "auth-service", "generation": 4}})
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    monkeypatch.setattr(env_orchestrator.subprocess, "run", fake_run)
+    watch = FakeWatch()
+
+    assert env_orchestrator.deploy_and_wait("auth-env", watch)[0]
+    assert ["docker", "build", "-t"] in commands
+    assert ["kubectl", "apply", "-f"] in commands
+    assert watch.targets[-1] == {"auth-service": 4}
+
+    commands.clear()
+    assert env_orchestrator.deploy_and_wait("auth-env", watch)[0]
+    assert ["docker", "build", "-t"] not in commands
+    assert ["kubectl", "apply", "-f"] not in commands
+    assert watch.targets[-1] == {"auth-service": None}
@@ -0,0 +1,101 @@
+import json
+import sys
+import threading
+from conftest import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
+import readiness  # noqa: E402
+sys.path.remove(SRC_DIR)
+
+
+def event(name, kind="MODIFIED", replicas=2, available=2, updated=None,
+          generation=1, observed=None, total=None):
+    return {"type": kind, "object": {
+        "kind": "Deployment",
+        "metadata": {"name": name, "generation": generation},
+        "spec": {"replicas": replicas},
+        "status": {
+            "observedGeneration": generation if observed is None else observed,
+            "replicas": replicas if total is None else total,
+            "updatedReplicas": replicas if updated is None else updated,
+            "availableReplicas": available,
+        },
+    }}
+
+
+class FakeStream:
+    """
+    Stream que entrega los eventos en fragmentos pequeños, partiendo los
+    objetos JSON, y queda abierto hasta que se cierra o se agota
+    """
+
+    def __init__(self, events, chunk_size=7, hold_open=True):
+        text = "".join(json.dumps(e, indent=2) + "\n" for e in events)
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.hold_open = hold_open
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield from self.chunks
+        if self.hold_open:
+            self.closed.wait()
+
+    def close(self):
+        self.closed.set()
+
+
+def test_parser_handles_objects_split_across_chunks():
+    parser = readiness.JSONStreamParser()
+    text = json.dumps({"a": 1}, indent=2) + json.dumps({"b": "ñ"})
+    objects = []
+    for i in range(0, len(text), 3):
+        objects += parser.feed(text[i:i + 3])
+    assert objects == [{"a": 1}, {"b": "ñ"}]
+
+
+def test_waits_for_every_replica_of_every_service():
+    events = [
+        event("auth-service", available=1),
+        event("todo-service", available=2),
+        event("auth-service", available=2, total=3),  # réplica antigua aún viva
+    ]
+    stream = FakeStream(events)
+    with readiness.DeploymentWatch(lambda: stream) as watch:
+        assert not watch.wait_for({"auth-service": None, "todo-service": None}, 0.3)
+        assert watch.states()["todo-service"]["ready"]
+
+    stream = FakeStream(events + [event("auth-service", available=2)])
+    with readiness.DeploymentWatch(lambda: stream) as watch:
+        assert watch.wait_for({"auth-service": None, "todo-service": None}, 2)
+
+
+def test_status_older_than_the_applied_generation_is_not_ready():
+    stream = FakeStream([event("db", replicas=1, available=1, generation=1)])
+    with readiness.DeploymentWatch(lambda: stream) as watch:
+        assert not watch.wait_for({"db": 2}, 0.3)
+
+    stream = FakeStream([event("db", replicas=1, available=1, generation=2, observed=1)])
+    with readiness.DeploymentWatch(lambda: stream) as watch:
+        assert not watch.wait_for({"db": 2}, 0.3)
+
+
+def test_reconnects_with_exponential_backoff():
+    streams = [FakeStream([], hold_open=False), FakeStream([], hold_open=False),
+               FakeStream([event("db", replicas=1, available=1)])]
+    opened = []
+
+    def open_stream():
+        opened.append(len(opened))
+        return streams[min(len(opened) - 1, len(streams) - 1)]
+
+    watch = readiness.DeploymentWatch(open_stream, backoff_initial=0.01, backoff_max=0.04)
+    with watch:
+        assert watch.wait_for({"db": None}, 2)
+    assert watch.reconnects == 2
+
+
+def test_deleted_deployment_is_not_ready():
+    stream = FakeStream([event("db", replicas=1, available=1),
+                         event("db", kind="DELETED", replicas=1, available=1)])
+    with readiness.DeploymentWatch(lambda: stream) as watch:
+        assert not watch.wait_for({"db": None}, 0.3)
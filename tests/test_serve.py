@@ -0,0 +1,42 @@
+import os
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("uvicorn")
+
+
+@pytest.mark.parametrize("service", ["auth_service", "todo_service"])
+def test_worker_count_auto_uses_available_cpus(service, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "auto")
+    serve = load_service_module(service, "serve")
+    assert serve.worker_count() == serve.available_cpus() >= 1
+
+    monkeypatch.setattr(serve, "WEB_CONCURRENCY", "3")
+    assert serve.worker_count() == 3
+
+
+def test_auth_workers_share_one_ephemeral_key_and_split_bcrypt_threads(monkeypatch, tmp_path):
+    # setenv antes de delenv para que monkeypatch restaure ambas variables:
+    # prepare_workers las escribe directamente en os.environ
+    for name in ("JWT_KEYS_DIR", "HASH_WORKERS"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    serve = load_service_module("auth_service", "serve")
+    monkeypatch.setattr(serve, "available_cpus", lambda: 8)
+    monkeypatch.setattr(serve.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path))
+
+    serve.prepare_workers(4)
+    assert os.environ["HASH_WORKERS"] == "2"
+    assert os.environ["JWT_KEYS_DIR"] == str(tmp_path)
+    assert os.listdir(tmp_path) == ["ephemeral.pem"]
+
+
+def test_todo_refuses_memory_cache_with_several_workers(monkeypatch):
+    serve = load_service_module("todo_service", "serve")
+    monkeypatch.setenv("TASK_CACHE_BACKEND", "memory")
+    serve.check_task_cache(1)
+    with pytest.raises(SystemExit):
+        serve.check_task_cache(2)
+
+    monkeypatch.setenv("TASK_CACHE_BACKEND", "redis")
+    serve.check_task_cache(2)
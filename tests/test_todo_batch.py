@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from conftest import load_service_module, requires_db
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("psycopg2")
+pytest.importorskip("jwt")
+
+pytestmark = requires_db
+
+
+@pytest.fixture
+def service(schema, monkeypatch):
+    monkeypatch.setenv("TASKS_BATCH_MAX", "4")
+    monkeypatch.setenv("TASK_CACHE_BACKEND", "memory")
+    main = load_service_module("todo_service", "main")
+    main.app.dependency_overrides[main.verify_token] = lambda: "ana"
+
+    async def migrate():
+        try:
+            await main.migrations.migrate(main.db.get_database())
+        finally:
+            await main.db.close_database()
+
+    asyncio.run(migrate())
+    return main, schema
+
+
+def run(main, scenario):
+    async def wrapper():
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://todo") as client:
+                return await scenario(client)
+        finally:
+            await main.db.close_database()
+    return asyncio.run(wrapper())
+
+
+def batch(client, method, body):
+    return client.request(method, "/tasks:batch", json=body)
+
+
+def statuses(response):
+    return [item["status"] for item in response.json()["results"]]
+
+
+def task_ids(schema, username):
+    return dict(schema(f"SELECT title, id FROM task WHERE username = '{username}'"))
+
+
+def test_add_reports_existing_and_repeated_titles(service):
+    main, schema = service
+    schema("INSERT INTO task (username, title, description) VALUES ('ana', 'a', '')")
+
+    response = run(main, lambda client: batch(client, "POST", {"tasks": [
+        {"title": "b", "description": "1"}, {"title": "a", "description": "2"},
+        {"title": "b", "description": "3"}, {"title": "c", "description": "4"}]}))
+
+    assert response.status_code == 200
+    assert statuses(response) == [201, 409, 409, 201]
+    ids = task_ids(schema, "ana")
+    results = response.json()["results"]
+    assert [results[0]["id"], results[3]["id"]] == [ids["b"], ids["c"]]
+    assert schema("SELECT description FROM task WHERE title = 'b'") == [("1",)]
+
+
+def test_update_uses_single_statement_when_there_are_no_conflicts(service):
+    main, schema = service
+    schema("""
+        INSERT INTO task (username, title, description) VALUES
+            ('ana', 'a', ''), ('ana', 'b', ''), ('bob', 'x', '')
+    """)
+    ids, bob = task_ids(schema, "ana"), task_ids(schema, "bob")
+
+    response = run(main, lambda client: batch(client, "PUT", {"tasks": [
+        {"id": ids["a"], "title": "a2", "description": "1"},
+        {"id": ids["b"], "title": "b2", "description": "2"},
+        {"id": ids["a"], "title": "a3", "description": "3"},
+        {"id": bob["x"], "title": "x2", "description": "4"}]}))
+
+    # Un id repetido en el lote y una tarea de otro usuario se rechazan por ítem
+    assert statuses(response) == [200, 200, 409, 404]
+    assert task_ids(schema, "ana") == {"a2": ids["a"], "b2": ids["b"]}
+    assert task_ids(schema, "bob") == bob
+
+
+def test_update_falls_back_to_savepoints_on_title_conflict(service):
+    main, schema = service
+    schema("""
+        INSERT INTO task (username, title, description) VALUES
+            ('ana', 'a', ''), ('ana', 'b', ''), ('ana', 'c', '')
+    """)
+    ids = task_ids(schema, "ana")
+
+    response = run(main, lambda client: batch(client, "PUT", {"tasks": [
+        {"id": ids["a"], "title": "a2", "description": "1"},
+        {"id": ids["b"], "title": "c", "description": "2"},
+        {"id": 999999, "title": "z", "description": "3"}]}))
+
+    assert statuses(response) == [200, 409, 404]
+    assert task_ids(schema, "ana") == {"a2": ids["a"], "b": ids["b"], "c": ids["c"]}
+
+
+def test_remove_reports_missing_and_repeated_ids(service):
+    main, schema = service
+    schema("""
+        INSERT INTO task (username, title, description) VALUES
+            ('ana', 'a', ''), ('ana', 'b', ''), ('bob', 'x', '')
+    """)
+    ids, bob = task_ids(schema, "ana"), task_ids(schema, "bob")
+
+    response = run(main, lambda client: batch(client, "DELETE", {
+        "ids": [ids["a"], bob["x"], ids["a"], 999999]}))
+
+    assert statuses(response) == [200, 404, 404, 404]
+    assert task_ids(schema, "ana") == {"b": ids["b"]}
+    assert task_ids(schema, "bob") == bob
+
+
+def test_batches_over_the_limit_are_rejected(service):
+    main, schema = service
+
+    async def scenario(client):
+        return [
+            await batch(client, "POST", {"tasks": [
+                {"title": str(i), "description": ""} for i in range(5)]}),
+            await batch(client, "PUT", {"tasks": [
+                {"id": i, "title": str(i), "description": ""} for i in range(5)]}),
+            await batch(client, "DELETE", {"ids": list(range(5))}),
+            await batch(client, "DELETE", {"ids": []}),
+        ]
+
+    assert [r.status_code for r in run(main, scenario)] == [422] * 4
+    assert schema("SELECT count(*) FROM task") == [(0,)]
+
+
+def test_writes_bump_the_task_version_once_per_batch(service):
+    main, schema = service
+
+    async def scenario(client):
+        etag = (await client.get("/tasks")).headers["etag"]
+        await batch(client, "POST", {"tasks": [
+            {"title": "a", "description": ""}, {"title": "b", "description": ""}]})
+        await batch(client, "DELETE", {"ids": [999999]})
+        return etag, (await client.get("/tasks")).headers["etag"]
+
+    assert run(main, scenario) == ('"0"', '"1"')
+    assert schema("SELECT username, version FROM task_versions") == [("ana", 1)]
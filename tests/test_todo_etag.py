@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+import pytest
+from conftest import load_service_module
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("jwt")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("TASK_CACHE_BACKEND", "none")
+    main = load_service_module("todo_service", "main")
+    queries, versions = [], {"ana": 3}
+
+    async def fake_get_task_version(username):
+        return versions.get(username, 0)
+
+    async def fake_get_tasks(username, limit=None, after_id=None, version=None):
+        queries.append((username, version))
+        return [{"id": 1, "title": "t", "description": "d"}]
+
+    monkeypatch.setattr(main, "get_task_version", fake_get_task_version)
+    monkeypatch.setattr(main, "get_tasks", fake_get_tasks)
+    main.app.dependency_overrides[main.verify_token] = lambda: "ana"
+    return main, queries, versions
+
+
+def get(main, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://todo") as client:
+            return await client.get("/tasks", headers=headers or {})
+    return asyncio.run(scenario())
+
+
+def test_unchanged_list_answers_304_without_query(service):
+    main, queries, _ = service
+    first = get(main)
+    assert first.status_code == 200 and first.json()[0]["id"] == 1
+    etag = first.headers["etag"]
+    assert etag == '"3"'
+
+    second = get(main, {"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b"" and second.headers["etag"] == etag
+    assert queries == [("ana", 3)]
+
+    assert get(main, {"If-None-Match": f'"otro", W/{etag}'}).status_code == 304
+
+
+def test_write_changes_etag(service):
+    main, queries, versions = service
+    etag = get(main).headers["etag"]
+    versions["ana"] += 1
+
+    response = get(main, {"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"4"'
+    assert queries == [("ana", 3), ("ana", 4)]
+
+
+def test_etag_matches():
+    main = load_service_module("todo_service", "main")
+    assert main.etag_matches('"a", "b"', '"b"')
+    assert main.etag_matches('W/"b"', '"b"')
+    assert main.etag_matches("*", '"b"')
+    assert not main.etag_matches(None, '"b"')
+    assert not main.etag_matches('"a"', '"b"')
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import pytest
+from conftest import connect_params, load_service_module, requires_db
+
+pytest.importorskip("psycopg2")
+
+
+@pytest.fixture
+def events():
+    return load_service_module("todo_service", "events")
+
+
+def notification(username, op="insert", ids=(1,)):
+    return json.dumps({"username": username, "op": op, "ids": list(ids)})
+
+
+def drain(subscription):
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+
+def test_notifications_reach_only_the_owner(events):
+    async def scenario():
+        hub = events.TaskEventHub()
+        ana, ana_tab, bob = hub.subscribe("ana"), hub.subscribe("ana"), hub.subscribe("bob")
+        hub.dispatch(notification("ana", "update", [7]))
+        return drain(ana), drain(ana_tab), drain(bob), hub.stats()
+
+    ana, ana_tab, bob, stats = asyncio.run(scenario())
+    assert ana == ana_tab == [("task", '{"op": "update", "ids": [7]}')]
+    assert bob == []
+    assert stats["delivered"] == 2 and stats["clients"] == 3
+
+
+def test_slow_client_gets_single_resync(events):
+    async def scenario():
+        hub = events.TaskEventHub(queue_size=3)
+        slow = hub.subscribe("ana")
+        for i in range(10):
+            hub.dispatch(notification("ana", ids=[i]))
+        return drain(slow), hub.stats()
+
+    queued, stats = asyncio.run(scenario())
+    assert queued[0] == ("resync", "{}")
+    assert len(queued) <= 3
+    assert stats["overflows"] >= 1
+
+
+def test_subscriber_limit(events):
+    async def scenario():
+        hub = events.TaskEventHub(max_clients=1)
+        first = hub.subscribe("ana")
+        with pytest.raises(events.TooManySubscribers):
+            hub.subscribe("bob")
+        hub.unsubscribe(first)
+        hub.subscribe("bob")
+        return hub.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1 and stats["clients"] == 1
+
+
+def test_sse_format_heartbeat_and_cleanup(events):
+    async def scenario():
+        hub = events.TaskEventHub(heartbeat=0.01)
+        subscription = hub.subscribe("ana")
+        stream = hub.sse(subscription)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        hub.dispatch(notification("ana", "delete", [3]))
+        chunks.append(await stream.__anext__())
+        await stream.aclose()
+        return chunks, hub.stats()
+
+    chunks, stats = asyncio.run(scenario())
+    assert chunks[0].startswith("retry: 3000\nevent: ready\n")
+    assert chunks[1] == ": keep-alive\n\n"
+    assert chunks[2] == 'event: task\ndata: {"op": "delete", "ids": [3]}\n\n'
+    assert stats["clients"] == 0 and stats["users"] == 0
+
+
+def test_publish_omits_ids_over_notify_limit(events):
+    class FakeDatabase:
+        def __init__(self):
+            self.calls = []
+
+        async def execute(self, query, params=None):
+            self.calls.append(params)
+
+    database = FakeDatabase()
+    hub = events.TaskEventHub()
+    asyncio.run(hub.publish(database, "ana", "insert", {3, 1, 2}))
+    asyncio.run(hub.publish(database, "ana", "insert", range(events.NOTIFY_MAX_IDS + 1)))
+
+    channel, payload = database.calls[0]
+    assert channel == events.TASK_EVENTS_CHANNEL
+    assert json.loads(payload) == {"username": "ana", "op": "insert", "ids": [1, 2, 3]}
+    assert json.loads(database.calls[1][1])["ids"] is None
+
+
+def test_listen_connection_uses_tcp_keepalives(monkeypatch):
+    db = load_service_module("todo_service", "db")
+    opened = []
+
+    class FakeConnection:
+        autocommit = False
+
+    def connect(**kwargs):
+        opened.append(kwargs)
+        return FakeConnection()
+
+    monkeypatch.setattr(db.psycopg2, "connect", connect)
+    conn = db.dedicated_connection()
+    assert conn.autocommit
+    assert opened[0]["keepalives"] == 1
+    assert opened[0]["keepalives_idle"] == db.LISTEN_KEEPALIVE_IDLE
+    assert opened[0]["keepalives_interval"] and opened[0]["keepalives_count"]
+
+
+@requires_db
+def test_notify_is_sent_only_when_the_write_commits(schema):
+    import psycopg2
+    db = load_service_module("todo_service", "db")
+    migrations = load_service_module("todo_service", "migrations")
+    business_logic = load_service_module("todo_service", "business_logic")
+    events = load_service_module("todo_service", "events")
+    HTTPException = business_logic.HTTPException
+
+    listener = psycopg2.connect(**connect_params())
+    listener.autocommit = True
+    with listener.cursor() as cur:
+        cur.execute(f"LISTEN {events.TASK_EVENTS_CHANNEL}")
+
+    async def scenario():
+        try:
+            await migrations.migrate(db.get_database())
+            await business_logic.add_task("ana", "Comprar leche", "")
+            with pytest.raises(HTTPException):
+                await business_logic.add_task("ana", "Comprar leche", "")
+            with pytest.raises(HTTPException):
+                await business_logic.remove_task(999999)
+        finally:
+            await db.close_database()
+
+    try:
+        asyncio.run(scenario())
+        listener.poll()
+        notified = [json.loads(n.payload) for n in listener.notifies]
+    finally:
+        listener.close()
+    assert [(n["username"], n["op"]) for n in notified] == [("ana", "insert")]
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+from conftest import load_service_module, requires_db
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("psycopg2")
+pytest.importorskip("jwt")
+
+pytestmark = requires_db
+
+
+@pytest.fixture
+def service(schema, monkeypatch):
+    monkeypatch.setenv("TASKS_STREAM_BATCH", "2")
+    monkeypatch.setenv("TASK_CACHE_BACKEND", "none")
+    main = load_service_module("todo_service", "main")
+    main.app.dependency_overrides[main.verify_token] = lambda: "ana"
+
+    async def migrate():
+        try:
+            await main.migrations.migrate(main.db.get_database())
+        finally:
+            await main.db.close_database()
+
+    asyncio.run(migrate())
+    schema("""
+        INSERT INTO task (username, title, description)
+        SELECT u, u || ' ' || i, '' FROM generate_series(1, 5) AS i, unnest(ARRAY['ana', 'bob']) AS u
+    """)
+    ids = [row[0] for row in schema("SELECT id FROM task WHERE username = 'ana' ORDER BY id")]
+    return main, ids
+
+
+def get(main, params):
+    async def scenario():
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://todo") as client:
+                return await client.get("/tasks", params=params)
+        finally:
+            await main.db.close_database()
+    return asyncio.run(scenario())
+
+
+def test_keyset_pages_follow_next_after_id(service):
+    main, ids = service
+    pages, params = [], {"limit": 2}
+    while True:
+        response = get(main, params)
+        pages.append([task["id"] for task in response.json()])
+        next_after = response.headers.get("x-next-after-id")
+        if next_after is None:
+            break
+        params = {"limit": 2, "after_id": next_after}
+
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+
+def test_last_full_page_still_points_to_an_empty_page(service):
+    main, ids = service
+    response = get(main, {"limit": 1, "after_id": ids[3]})
+    assert [task["id"] for task in response.json()] == [ids[4]]
+    assert response.headers["x-next-after-id"] == str(ids[4])
+
+    response = get(main, {"limit": 1, "after_id": ids[4]})
+    assert response.json() == []
+    assert "x-next-after-id" not in response.headers
+
+
+def test_ndjson_streams_in_cursor_batches(service, monkeypatch):
+    main, ids = service
+    batches = []
+    stream_tasks = main.stream_tasks
+
+    async def recording(username, after_id=None, batch_size=500, version=None):
+        async for rows in stream_tasks(username, after_id, batch_size, version):
+            batches.append(len(rows))
+            yield rows
+
+    monkeypatch.setattr(main, "stream_tasks", recording)
+    response = get(main, {"format": "ndjson", "after_id": ids[0]})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids[1:]
+    assert batches == [2, 2]
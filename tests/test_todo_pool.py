@@ -0,0 +1,127 @@
+import threading
+import pytest
+from conftest import load_service_module
+
+psycopg2 = pytest.importorskip("psycopg2")
+from psycopg2.extensions import (  # noqa: E402
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def db():
+    return load_service_module("todo_service", "db")
+
+
+def make_pool(db, **kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return db.ConnectionPool(connect, **kwargs), created
+
+
+def test_pool_reuses_connections(db):
+    pool, created = make_pool(db, min_size=1, max_size=2)
+    for _ in range(5):
+        with pool.connection():
+            pass
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 5
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+
+def test_pool_times_out_when_saturated(db):
+    pool, _ = make_pool(db, min_size=0, max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["size"] <= stats["max_size"]
+
+
+def test_pool_replaces_broken_connections(db):
+    pool, created = make_pool(db, min_size=1, max_size=2,
+                              healthcheck_interval=0)
+    created[0].broken = True
+    with pool.connection() as conn:
+        assert conn is created[1]
+    stats = pool.stats()
+    assert stats["reconnects"] == 1
+    assert created[0].closed
+
+
+def test_pool_discards_connection_on_operational_error(db):
+    pool, created = make_pool(db, min_size=1, max_size=1)
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection():
+            raise psycopg2.OperationalError("conexión perdida")
+    assert created[0].closed
+    assert pool.stats()["size"] == 0
+
+
+def test_pool_rolls_back_pending_transaction(db):
+    pool, created = make_pool(db, min_size=1, max_size=1)
+    with pool.connection() as conn:
+        conn.status = TRANSACTION_STATUS_INERROR
+    assert created[0].status == TRANSACTION_STATUS_IDLE
+    assert not created[0].closed
+
+
+def test_pool_never_exceeds_max_size(db):
+    pool, created = make_pool(db, min_size=0, max_size=3, timeout=2)
+    barrier = threading.Barrier(6)
+
+    def worker():
+        barrier.wait()
+        for _ in range(20):
+            with pool.connection():
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) <= 3
+    assert pool.stats()["peak_in_use"] <= 3
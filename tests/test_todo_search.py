@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from conftest import load_service_module, requires_db
+
+pytest.importorskip("psycopg2")
+
+pytestmark = requires_db
+
+
+@pytest.fixture
+def search(schema):
+    db = load_service_module("todo_service", "db")
+    migrations = load_service_module("todo_service", "migrations")
+    business_logic = load_service_module("todo_service", "business_logic")
+
+    def run(coro_fn):
+        async def scenario():
+            try:
+                return await coro_fn(business_logic)
+            finally:
+                await db.close_database()
+        return asyncio.run(scenario())
+
+    run(lambda _: migrations.migrate(db.get_database()))
+    return run, schema
+
+
+def test_search_ranks_and_scopes_to_user(search):
+    run, schema = search
+    schema("""
+        INSERT INTO task (username, title, description) VALUES
+            ('ana', 'Comprar leche', 'en el supermercado'),
+            ('ana', 'Llamar al banco', 'preguntar por la leche de la cuenta'),
+            ('ana', 'Pagar la luz', 'antes del viernes'),
+            ('bob', 'Comprar leche', 'entera')
+    """)
+
+    async def scenario(bl):
+        return (await bl.search_tasks("ana", "leche", 10),
+                await bl.search_tasks("ana", '"pagar la luz" -viernes', 10))
+
+    by_word, excluded = run(scenario)
+    # La coincidencia en el título pesa más que en la descripción
+    assert [t["title"] for t in by_word] == ["Comprar leche", "Llamar al banco"]
+    assert excluded == []
+
+
+def test_search_keyset_pagination(search):
+    run, schema = search
+    schema("""
+        INSERT INTO task (username, title, description)
+        SELECT 'ana', 'tarea ' || i, CASE WHEN i % 2 = 0 THEN 'informe informe' ELSE 'informe' END
+        FROM generate_series(1, 25) AS i
+    """)
+
+    async def scenario(bl):
+        pages, after = [], None
+        while True:
+            page = await bl.search_tasks("ana", "informe", 10, after)
+            pages.append(page)
+            if len(page) < 10:
+                return pages
+            after = (page[-1]["rank"], page[-1]["id"])
+
+    pages = run(scenario)
+    ids = [t["id"] for page in pages for t in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert len(set(ids)) == 25
+    ranks = [t["rank"] for page in pages for t in page]
+    assert ranks == sorted(ranks, reverse=True)
+
+
+def test_search_uses_gin_index(search):
+    _, schema = search
+    indexes = {row[0] for row in schema(
+        "SELECT indexdef FROM pg_indexes WHERE indexname = 'task_search_idx'")}
+    assert any("gin (search)" in index for index in indexes)
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from conftest import load_service_module
+
+
+class FakeRedis:
+    """
+    Sustituto en memoria del subconjunto de redis.asyncio que usa la cache
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, px=None):
+        self.data[key] = value
+        return True
+
+
+@pytest.fixture
+def cache():
+    return load_service_module("todo_service", "cache")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def task_cache(request, cache):
+    if request.param == "memory":
+        return cache.MemoryTaskCache(max_size=2, ttl=60)
+    return cache.RedisTaskCache(client=FakeRedis(), ttl=60)
+
+
+def test_list_is_served_only_for_its_version(task_cache):
+    async def scenario():
+        assert await task_cache.read("ana", 1) is None
+        await task_cache.write("ana", 1, [{"id": 1}])
+        assert await task_cache.read("ana", 1) == [{"id": 1}]
+        # Una escritura sube la versión: la lista guardada ya no sirve
+        assert await task_cache.read("ana", 2) is None
+        assert await task_cache.read("bob", 1) is None
+
+    asyncio.run(scenario())
+    info = task_cache.info()
+    assert (info["hits"], info["misses"]) == (1, 3)
+
+
+def test_memory_cache_keeps_the_newest_version(cache):
+    task_cache = cache.MemoryTaskCache(max_size=2, ttl=60)
+
+    async def scenario():
+        await task_cache.write("ana", 2, ["nuevo"])
+        # Una lectura lenta que empezó antes de la escritura llega tarde
+        await task_cache.write("ana", 1, ["viejo"])
+        return await task_cache.read("ana", 2)
+
+    assert asyncio.run(scenario()) == ["nuevo"]
+
+
+def test_memory_cache_evicts_and_expires(cache, monkeypatch):
+    task_cache = cache.MemoryTaskCache(max_size=2, ttl=60)
+
+    async def scenario():
+        for user in ("a", "b", "c"):
+            await task_cache.write(user, 1, [user])
+        assert await task_cache.read("a", 1) is None
+        assert await task_cache.read("c", 1) == ["c"]
+
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + 61)
+        assert await task_cache.read("c", 1) is None
+
+    asyncio.run(scenario())
+    assert task_cache.info()["evictions"] == 1
+
+
+def test_default_backend_is_never_memory(monkeypatch):
+    monkeypatch.delenv("TASK_CACHE_BACKEND", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    assert load_service_module("todo_service", "cache").TASK_CACHE_BACKEND == "none"
+
+    pytest.importorskip("redis")
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6379/0")
+    assert load_service_module("todo_service", "cache").TASK_CACHE_BACKEND == "redis"
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+import pytest
+from conftest import load_service_module
+
+jwt = pytest.importorskip("jwt")
+ed25519 = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ed25519")
+
+
+def new_key(kid):
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    jwk = json.loads(jwt.algorithms.OKPAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": "EdDSA", "use": "sig"})
+    return private_key, jwk
+
+
+def sign(private_key, kid, **claims):
+    claims.setdefault("username", "ana")
+    claims.setdefault("exp", time.time() + 60)
+    return jwt.encode(claims, private_key, algorithm="EdDSA", headers={"kid": kid})
+
+
+class FakeJWKS:
+    def __init__(self, *jwks):
+        self.keys = list(jwks)
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise OSError("auth_service caído")
+        return {"keys": self.keys}
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    module = load_service_module("todo_service", "auth")
+    monkeypatch.setattr(module, "token_cache", module.TokenCache(2, 60))
+    return module
+
+
+@pytest.fixture
+def signer(auth, monkeypatch):
+    private_key, jwk = new_key("k1")
+    fetch = FakeJWKS(jwk)
+    monkeypatch.setattr(auth, "jwks_cache", auth.JWKSCache("jwks", 300, 0, fetch=fetch))
+    return private_key, fetch
+
+
+def decode(auth, token):
+    return asyncio.run(auth.decode_token(token))
+
+
+def test_repeated_token_is_served_from_cache(auth, signer, monkeypatch):
+    token = sign(signer[0], "k1")
+    assert decode(auth, token)["username"] == "ana"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería verificar la firma de nuevo")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert decode(auth, token)["username"] == "ana"
+    stats = auth.token_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert signer[1].calls == 1
+
+
+def test_unknown_kid_refreshes_jwks_after_rotation(auth, signer):
+    _, fetch = signer
+    assert decode(auth, sign(signer[0], "k1"))["username"] == "ana"
+
+    rotated_key, rotated_jwk = new_key("k2")
+    fetch.keys.append(rotated_jwk)
+    assert decode(auth, sign(rotated_key, "k2", username="bob"))["username"] == "bob"
+    assert fetch.calls == 2
+
+
+def test_unknown_kid_refresh_is_rate_limited(auth, signer):
+    _, fetch = signer
+    auth.jwks_cache.min_refresh = 60
+    decode(auth, sign(signer[0], "k1"))
+
+    forged_key, _ = new_key("forged")
+    for _ in range(3):
+        with pytest.raises(jwt.InvalidTokenError):
+            decode(auth, sign(forged_key, "forged"))
+    assert fetch.calls == 1
+
+
+def test_failed_refresh_keeps_previous_keys(auth, signer):
+    _, fetch = signer
+    decode(auth, sign(signer[0], "k1"))
+    fetch.fail = True
+    auth.jwks_cache.ttl = 0
+
+    assert decode(auth, sign(signer[0], "k1", username="eva"))["username"] == "eva"
+    assert auth.jwks_cache.stats()["errors"] == 1
+
+
+def test_jwks_unavailable_without_cached_keys(auth, signer):
+    signer[1].fail = True
+    with pytest.raises(auth.JWKSUnavailable):
+        decode(auth, sign(signer[0], "k1"))
+
+
+def test_refresh_token_is_rejected(auth, signer):
+    with pytest.raises(jwt.InvalidTokenError):
+        decode(auth, sign(signer[0], "k1", type="refresh"))
+
+
+def test_cache_entry_does_not_outlive_token_exp(auth):
+    cache = auth.token_cache
+    key = cache.key("token")
+    cache.put(key, {"username": "ana", "exp": time.time() - 1})
+    assert cache.get(key) is None
+
+
+def test_cache_evicts_least_recently_used(auth):
+    cache = auth.token_cache
+    for name in ("a", "b"):
+        cache.put(cache.key(name), {"username": name})
+    cache.get(cache.key("a"))
+    cache.put(cache.key("c"), {"username": "c"})
+
+    assert cache.get(cache.key("b")) is None
+    assert cache.get(cache.key("a")) == {"username": "a"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalid_token_is_not_cached(auth):
+    with pytest.raises(jwt.InvalidTokenError):
+        decode(auth, "no-es-un-token")
+    assert auth.token_cache.stats()["size"] == 0